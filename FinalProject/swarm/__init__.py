@@ -0,0 +1,35 @@
+from .config import SwarmConfig
+from .state import SwarmState, random_non_red_colors, set_leaders, spawn
+from .step import step
+
+# Nothing here imports pygame; it is loaded only by swarm.app, swarm.render,
+# swarm.capture and the replay viewer. The names below are loaded on first
+# use, which also lets `python -m swarm.headless` run without importing the
+# module twice.
+_LAZY = {
+    "RunResult": "headless",
+    "Trajectory": "headless",
+    "run": "headless",
+    "run_window": "app",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+        return getattr(importlib.import_module(f".{_LAZY[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = [
+    "RunResult",
+    "SwarmConfig",
+    "SwarmState",
+    "Trajectory",
+    "random_non_red_colors",
+    "run",
+    "run_window",
+    "set_leaders",
+    "spawn",
+    "step",
+]
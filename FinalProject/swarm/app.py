@@ -0,0 +1,109 @@
+import os
+
+from .state import spawn
+from .step import step
+
+CAPTION = "Formation control with follower leader (boid model)"
+
+
+# Open a window and run the simulation until it is closed.
+#
+# By default the physics runs on its own thread at `physics_rate` steps per
+# second (see swarm.realtime.SimulationThread) and the window draws the
+# latest published state at up to `fps` frames per second, so a slow step
+# does not drop frames and a slow display does not slow the simulation.
+# With threaded=False every frame runs one step and then draws it.
+#
+# Frames are drawn by swarm.render.SwarmView: only the regions that changed
+# are redrawn and pushed to the display (dirty_rects=False redraws the whole
+# window), and past lod_threshold boids the followers are drawn as `lod`,
+# "points" or a density "heatmap".
+#
+# F3 toggles the per-phase HUD. With record_path every frame is recorded in
+# the background (see swarm.capture.FrameRecorder) and with profile_csv every
+# profiled frame is logged to that CSV file (physics steps of the threaded
+# loop to <name>_physics.csv). A swarm.metrics.FormationMetrics passed as
+# `metrics` is updated every step; query it while the window is open or
+# export it after run_window returns.
+def run_window(config, seed=None, resizable=False, caption=CAPTION, record_path=None, profile_csv=None,
+               threaded=True, physics_rate=60, fps=60, dirty_rects=True, lod_threshold=None, lod="points",
+               metrics=None):
+    import pygame
+
+    from .capture import FrameRecorder
+    from .profiling import Profiler
+    from .realtime import SimulationThread
+    from .render import LOD_THRESHOLD, PerformanceHUD, SwarmView
+
+    # Initialize Pygame
+    pygame.init()
+    flags = pygame.RESIZABLE if resizable else 0
+    screen = pygame.display.set_mode((config.width, config.height), flags)
+    pygame.display.set_caption(caption)
+    clock = pygame.time.Clock()
+
+    # Batched boid drawing with cached rotated sprites over a cached
+    # background with the obstacles
+    view = SwarmView(config.boid_size, LOD_THRESHOLD if lod_threshold is None else lod_threshold, lod, dirty_rects)
+    profiler = Profiler(enabled=False, csv_path=profile_csv)
+    recorder = FrameRecorder(record_path) if record_path else None
+
+    # Create boids with leaders and obstacles at random positions
+    swarm = spawn(config, seed)
+    simulation = None
+    physics = None
+    if threaded:
+        base, extension = os.path.splitext(profile_csv) if profile_csv else (None, None)
+        physics = Profiler(enabled=False, csv_path=f"{base}_physics{extension}" if profile_csv else None)
+        simulation = SimulationThread(swarm, config, physics_rate, physics, metrics).start()
+    hud = PerformanceHUD(profiler, physics=physics)
+
+    # Main loop
+    running = True
+    try:
+        while running:
+            # Event handling
+            with profiler.phase("events"):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
+                    elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                        profiler.toggle()
+                        if physics is not None:
+                            physics.toggle()
+                    elif event.type == pygame.VIDEORESIZE and resizable:
+                        # Update screen size when window is resized
+                        config.width, config.height = event.w, event.h
+                        screen = pygame.display.set_mode((event.w, event.h), flags)
+                        view.invalidate()
+
+            # Update all boids at once, or take the latest physics step
+            if simulation is not None:
+                frame = simulation.latest()
+            else:
+                step(swarm, config, profiler, metrics)
+                frame = swarm
+
+            # Draw boids over the background and obstacles
+            with profiler.phase("draw"):
+                view.draw(screen, frame)
+            if recorder:
+                recorder.capture(screen)
+            hud_area = hud.draw(screen)
+
+            with profiler.phase("flip"):
+                view.present([hud_area])
+            profiler.end_frame()
+
+            # Control frame rate
+            clock.tick(fps)
+    finally:
+        # Quit Pygame
+        if simulation is not None:
+            simulation.stop()
+            physics.close()
+        profiler.close()
+        if recorder:
+            recorder.close()
+        pygame.quit()
+    return swarm
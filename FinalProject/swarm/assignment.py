@@ -0,0 +1,259 @@
+import argparse
+import functools
+import math
+import time
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# Most follower-slot pairs one assignment solve takes. Its time grows with
+# the cube of the side, to a few ms at 140 x 140; larger problems are split
+# into blocks (see _match_points())
+MAX_PAIRS = 20_000
+
+
+# Distance between neighboring slots: FORMATION_DISTANCE, but never closer
+# than the followers keep apart anyway
+def slot_spacing(config):
+    return max(config.formation_distance, config.avoid_distance, 1.0)
+
+
+def _bit_reverse(index, bits):
+    reversed_index = np.zeros_like(index)
+    for bit in range(bits):
+        reversed_index |= ((index >> bit) & 1) << (bits - 1 - bit)
+    return reversed_index
+
+
+@functools.lru_cache(maxsize=16)
+def _lattice(radius, spacing, count):
+    offsets = np.empty((count, 2))
+    filled = 0
+    ring = 0
+    while filled < count:
+        r = radius + ring * spacing
+        # As many slots as fit at `spacing` apart, rounded down to a power of
+        # two so the bit-reversed order below is evenly spaced
+        bits = max(int(math.floor(math.log2(2 * math.pi * r / spacing))), 0) if r > 0 else 0
+        index = np.arange(min(1 << bits, count - filled))
+        angle = 2 * math.pi * _bit_reverse(index, bits) / (1 << bits)
+        offsets[filled:filled + len(index), 0] = r * np.cos(angle)
+        offsets[filled:filled + len(index), 1] = r * np.sin(angle)
+        filled += len(index)
+        ring += 1
+    offsets.flags.writeable = False
+    return offsets
+
+
+# Offsets from the leader of the first `count` slots of a formation: rings
+# SLOT_SPACING apart starting at FORMATION_RADIUS, each holding as many slots
+# as fit SLOT_SPACING apart. A ring fills in bit-reversed order, so any first
+# k slots of it are spread evenly around the leader; four slots are the four
+# points of the original formation. Every count gives a prefix of the same
+# lattice.
+def formation_lattice(config, count):
+    size = 1 << max(int(count) - 1, 0).bit_length()  # Shared by nearby counts
+    return _lattice(float(config.formation_radius), float(slot_spacing(config)), size)[:count]
+
+
+# Offsets from their leader of the given slots
+def lattice_offsets(config, slot):
+    lattice = formation_lattice(config, int(slot.max()) + 1 if len(slot) else 0)
+    return lattice[slot, 0], lattice[slot, 1]
+
+
+# Enough slots around every leader for an even share of the followers
+def slots_per_leader(num_followers, num_leaders):
+    return -(-num_followers // num_leaders) if num_leaders else 0
+
+
+def _distances(x, y, target_x, target_y):
+    return np.hypot(x[:, None] - target_x[None, :], y[:, None] - target_y[None, :])
+
+
+# Positions of the slots of the given leaders, leader-major: slot s of
+# leaders[g] is entry g * per_leader + s
+def _slot_positions(state, config, leaders, per_leader):
+    lattice = formation_lattice(config, per_leader)
+    slot_x = (state.x[leaders][:, None] + lattice[None, :, 0]).reshape(-1)
+    slot_y = (state.y[leaders][:, None] + lattice[None, :, 1]).reshape(-1)
+    return slot_x, slot_y
+
+
+# Column of every row of `cost` (at least as many columns as rows) in the
+# assignment of least total cost, with SciPy's Hungarian-type solver
+def _match(cost):
+    rows, cols = linear_sum_assignment(cost)
+    return cols[np.argsort(rows)]
+
+
+# Target of every point (x, y) among at least as many targets, by least
+# total distance. Above MAX_PAIRS pairs the points and the targets are cut
+# in two along the axis of their larger extent, each side with half the
+# points and as many targets as they need plus half the spare ones, until
+# every block is small enough to solve on its own. Blocks keep the matching
+# local; for thousands of followers it comes within about 3% of the least
+# total distance.
+def _match_points(x, y, target_x, target_y):
+    target = np.empty(len(x), dtype=np.intp)
+    blocks = [(np.arange(len(x)), np.arange(len(target_x)))]
+    while blocks:
+        rows, cols = blocks.pop()
+        if len(rows) * len(cols) <= MAX_PAIRS or len(rows) <= 1:
+            if len(rows):
+                target[rows] = cols[_match(_distances(x[rows], y[rows], target_x[cols], target_y[cols]))]
+            continue
+        extent_x = np.ptp(np.concatenate((x[rows], target_x[cols])))
+        extent_y = np.ptp(np.concatenate((y[rows], target_y[cols])))
+        along, target_along = (x, target_x) if extent_x >= extent_y else (y, target_y)
+        rows = rows[np.argsort(along[rows], kind="stable")]
+        cols = cols[np.argsort(target_along[cols], kind="stable")]
+        half = len(rows) // 2
+        cut = half + (len(cols) - len(rows)) // 2
+        blocks.append((rows[:half], cols[:cut]))
+        blocks.append((rows[half:], cols[cut:]))
+    return target
+
+
+# Give every follower a slot of the formation lattice around the leaders so
+# that the total distance from the followers to their slots is the smallest
+# possible (or close to it, above MAX_PAIRS follower-slot pairs). Writes
+# slot and group in place.
+def assign_slots(state, config):
+    followers, leaders = state.followers, state.leaders
+    if len(leaders) == 0 or len(followers) == 0:
+        return
+    per_leader = slots_per_leader(len(followers), len(leaders))
+    slot_x, slot_y = _slot_positions(state, config, leaders, per_leader)
+    chosen = _match_points(state.x[followers], state.y[followers], slot_x, slot_y)
+    state.group[followers] = chosen // per_leader
+    state.slot[followers] = chosen % per_leader
+
+
+# Update the slots after set_leaders() replaced the leaders `previous` by as
+# many new ones, changing only what the change displaced. Leaders that stay
+# keep their formations, and the formations of the leaders that left go to
+# the new leaders, each new leader matched by least total distance to where
+# a formation's followers would put their leader. Followers keep their
+# slots, and the old leaders joining the followers take the slots the new
+# leaders left, again by least total distance. The solves are only as large
+# as the number of leaders that changed. With a different number of leaders
+# everything is assigned anew by assign_slots().
+def reassign_slots(state, config, previous):
+    followers, leaders = state.followers, state.leaders
+    if len(leaders) != len(previous) or len(leaders) == 0 or len(followers) == 0:
+        assign_slots(state, config)
+        return
+    stays = np.isin(previous, leaders)
+    if stays.all():
+        return
+    vacated = np.flatnonzero(~stays)
+    arriving = np.flatnonzero(~np.isin(leaders, previous))
+    old, new = previous[vacated], leaders[arriving]
+    stayed = followers[~np.isin(followers, old)]
+    formation = state.group[stayed] % len(previous)
+    # Where the leader of each formation would have its followers in their
+    # slots on average
+    offset_x, offset_y = lattice_offsets(config, state.slot[stayed])
+    size = np.bincount(formation, minlength=len(previous))[vacated]
+    center_x = np.bincount(formation, state.x[stayed] - offset_x, len(previous))[vacated] / np.maximum(size, 1)
+    center_y = np.bincount(formation, state.y[stayed] - offset_y, len(previous))[vacated] / np.maximum(size, 1)
+    # An empty formation sits with its old leader
+    center_x = np.where(size > 0, center_x, state.x[old])
+    center_y = np.where(size > 0, center_y, state.y[old])
+    # New leader of every old formation, as an index into `leaders`
+    owner = np.empty(len(previous), dtype=np.intp)
+    owner[stays] = np.searchsorted(leaders, previous[stays])
+    owner[vacated[_match_points(state.x[new], state.y[new], center_x, center_y)]] = arriving
+
+    # The new leaders were followers; the old ones take their slots
+    freed_group = owner[state.group[new] % len(previous)]
+    freed_slot = state.slot[new]
+    offset_x, offset_y = lattice_offsets(config, freed_slot)
+    pick = _match_points(state.x[old], state.y[old], state.x[leaders[freed_group]] + offset_x,
+                         state.y[leaders[freed_group]] + offset_y)
+    state.group[stayed] = owner[formation]
+    state.group[old] = freed_group[pick]
+    state.slot[old] = freed_slot[pick]
+
+
+# Total distance from the followers to their slots
+def total_distance(state, config):
+    from .step import formation_targets
+
+    _, target_x, target_y = formation_targets(state, config, state.followers)
+    return float(np.hypot(target_x - state.x[state.followers], target_y - state.y[state.followers]).sum())
+
+
+def main():
+    from dataclasses import replace
+
+    from .metrics import FormationMetrics
+    from .presets import PRESETS
+    from .state import set_leaders, spawn
+    from .step import step
+
+    parser = argparse.ArgumentParser(description="Compare index and optimal formation slots")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="random_selection")
+    parser.add_argument("--boids", type=int, default=100)
+    parser.add_argument("--leaders", type=int, default=None)
+    parser.add_argument("--steps", type=int, default=1500)
+    parser.add_argument("--seeds", type=int, default=4)
+    parser.add_argument("--settle-fraction", type=float, default=0.3,
+                        help="Settled below this fraction of FORMATION_RADIUS mean error")
+    parser.add_argument("--changes", type=int, default=20, help="Leader changes to time the solve on")
+    args = parser.parse_args()
+
+    overrides = dict(num_boids=args.boids)
+    if args.leaders is not None:
+        overrides["num_leaders"] = args.leaders
+    base = PRESETS[args.preset](**overrides)
+
+    # Formation quality with a fixed leader, so convergence is not cut short
+    # by leader changes
+    print(f"{'slots':>8} {'error':>8} {'settled':>8} {'settle':>8} {'violations':>10}")
+    for mode in ("index", "optimal"):
+        config = replace(base, slot_assignment=mode, leader_change_interval=0)
+        errors, settle, violations = [], [], []
+        for seed in range(args.seeds):
+            state = spawn(config, seed)
+            metrics = FormationMetrics(config, settle_fraction=args.settle_fraction)
+            for _ in range(args.steps):
+                step(state, config, metrics=metrics)
+            summary = metrics.summary()
+            errors.append(summary["formation_error"]["mean"])
+            if summary["settle_steps"]["count"]:
+                settle.append(summary["settle_steps"]["mean"])
+            violations.append(summary["spacing_violations"]["mean"])
+        mean_settle = f"{np.mean(settle):8.0f}" if settle else f"{'never':>8}"
+        print(f"{mode:>8} {np.mean(errors):8.2f} {len(settle):>4}/{args.seeds:<3} {mean_settle} "
+              f"{np.mean(violations):10.2f}")
+
+    # A leader change repaired as change_leaders() does against assigning
+    # every slot anew: time and total distance from followers to slots
+    config = replace(base, slot_assignment="optimal", leader_change_interval=0)
+    state = spawn(config, 0)
+    rng = np.random.default_rng(0)
+    repair_time = full_time = 0.0
+    excess = []
+    for _ in range(args.changes):
+        previous = state.leaders
+        set_leaders(state, rng.choice(state.num_boids, size=len(previous), replace=False))
+        group, slot = state.group.copy(), state.slot.copy()
+        start = time.perf_counter()
+        assign_slots(state, config)
+        full_time += time.perf_counter() - start
+        full = total_distance(state, config)
+        state.group[:], state.slot[:] = group, slot
+        start = time.perf_counter()
+        reassign_slots(state, config, previous)
+        repair_time += time.perf_counter() - start
+        excess.append(total_distance(state, config) / full - 1)
+        for _ in range(50):
+            step(state, config)
+    print(f"leader change: {1000 * repair_time / args.changes:.2f} ms to repair the slots, "
+          f"{1000 * full_time / args.changes:.2f} ms to assign them anew; "
+          f"the repair leaves {100 * np.mean(excess):.1f}% more total distance")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from .presets import PRESETS
+from .state import spawn
+from .step import step
+
+
+# Time `steps` physics steps (and off-screen renders) of one configuration
+def bench_case(config, steps, warmup=10, seed=0, render=True):
+    state = spawn(config, seed)
+    renderer = surface = None
+    if render:
+        import pygame
+
+        from .render import BoidRenderer, ObstacleLayer
+        renderer = BoidRenderer(config.boid_size)
+        obstacle_layer = ObstacleLayer()
+        surface = pygame.Surface((config.width, config.height))
+
+    # Warm up the step and fill the sprite cache
+    for _ in range(warmup):
+        step(state, config)
+        if render:
+            renderer.draw(surface, state)
+
+    physics = 0.0
+    drawing = 0.0
+    for _ in range(steps):
+        start = time.perf_counter()
+        step(state, config)
+        physics += time.perf_counter() - start
+
+        if render:
+            start = time.perf_counter()
+            surface.fill((0, 0, 0))
+            renderer.draw(surface, state)
+            obstacle_layer.draw(surface, state.obstacles)
+            drawing += time.perf_counter() - start
+
+    # Peak memory of a fresh swarm and a few steps, measured separately so
+    # tracemalloc does not slow down the timed loop
+    tracemalloc.start()
+    state = spawn(config, seed)
+    for _ in range(min(steps, 10)):
+        step(state, config)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "steps": steps,
+        "steps_per_sec": steps / (physics + drawing),
+        "physics_ms": 1000 * physics / steps,
+        "render_ms": 1000 * drawing / steps if render else None,
+        "peak_memory_bytes": peak,
+    }
+
+
+def sweep(variants, num_boids, num_obstacles, num_leaders, steps, render=True, log=print):
+    results = []
+    for variant, n, m, leaders in itertools.product(variants, num_boids, num_obstacles, num_leaders):
+        config = PRESETS[variant](num_boids=n, num_obstacles=m, num_leaders=leaders)
+        result = {"variant": variant, "num_boids": n, "num_obstacles": m, "num_leaders": leaders}
+        result.update(bench_case(config, steps, render=render))
+        results.append(result)
+        if log:
+            render_ms = "-" if result["render_ms"] is None else f"{result['render_ms']:.3f}"
+            log(f"{variant:>16} N={n:<6} M={m:<5} L={leaders:<3} "
+                f"{result['steps_per_sec']:9.1f} steps/s  physics {result['physics_ms']:.3f} ms  "
+                f"render {render_ms} ms  peak {result['peak_memory_bytes'] / 2**20:.1f} MiB")
+    return results
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+# Cases of `results` whose steps/sec fell by more than `tolerance` compared
+# to the matching case in `baseline`
+def regressions(results, baseline, tolerance=0.2):
+    def key(r):
+        return r["variant"], r["num_boids"], r["num_obstacles"], r["num_leaders"]
+
+    previous = {key(r): r for r in baseline}
+    slower = []
+    for result in results:
+        before = previous.get(key(result))
+        if before and result["steps_per_sec"] < (1 - tolerance) * before["steps_per_sec"]:
+            slower.append((result, before))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark swarm throughput")
+    parser.add_argument("--variants", nargs="+", default=list(PRESETS), choices=list(PRESETS))
+    parser.add_argument("--boids", nargs="+", type=int, default=[100, 1000, 10000])
+    parser.add_argument("--obstacles", nargs="+", type=int, default=[0, 4, 100])
+    parser.add_argument("--leaders", nargs="+", type=int, default=[1, 3])
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--no-render", action="store_true", help="Time the physics only")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--baseline", help="Earlier results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if not args.no_render:
+        # Render to off-screen surfaces, no window is needed
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+    results = sweep(args.variants, args.boids, args.obstacles, args.leaders, args.steps, not args.no_render)
+    with open(args.output, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print(f"Saved {len(results)} results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        slower = regressions(results, baseline, args.tolerance)
+        for result, before in slower:
+            print(f"REGRESSION {result['variant']} N={result['num_boids']} M={result['num_obstacles']} "
+                  f"L={result['num_leaders']}: {before['steps_per_sec']:.1f} -> {result['steps_per_sec']:.1f} steps/s")
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
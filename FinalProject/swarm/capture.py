@@ -0,0 +1,149 @@
+import os
+import queue
+import shutil
+import subprocess
+import threading
+
+import numpy as np
+import pygame
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".avi", ".mov", ".webm")
+
+
+def _format_for(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npz":
+        return "npz"
+    if extension in VIDEO_EXTENSIONS:
+        return "video"
+    return "png"
+
+
+# Records frames without stalling the render loop.
+#
+# capture() copies the surface's pixels (a pixels3d view, so one memcpy) into
+# a preallocated buffer and queues it; a background thread encodes the frames
+# and hands the buffers back. There are at most `queue_size` buffers, so when
+# the writer falls behind new frames are dropped (counted in `dropped`)
+# rather than slowing the simulation, unless block=True.
+#
+# The output depends on `path`:
+#   "frames"   directory of numbered PNGs
+#   "run.npz"  run_00000.npz, run_00001.npz, ... with `chunk_frames` frames each
+#   "run.mp4"  video piped through ffmpeg (must be on PATH)
+class FrameRecorder:
+    def __init__(self, path, queue_size=32, chunk_frames=120, fps=60, block=False):
+        self.path = path
+        self.format = _format_for(path)
+        self.chunk_frames = chunk_frames
+        self.fps = fps
+        self.block = block
+        self.queue_size = queue_size
+        self.written = 0
+        self.dropped = 0
+
+        self._frames = queue.Queue()
+        self._free = queue.Queue()
+        self._allocated = 0
+        self._shape = None
+        self._encoder = None
+        self._video_size = None
+        self._chunks = 0
+        self._error = None
+        if self.format == "png":
+            os.makedirs(path, exist_ok=True)
+        elif self.format == "video" and shutil.which("ffmpeg") is None:
+            raise RuntimeError("Recording video needs ffmpeg on PATH; record to a .npz or a PNG directory instead")
+
+        self._thread = threading.Thread(target=self._write_loop, name="FrameRecorder", daemon=True)
+        self._thread.start()
+
+    def _buffer(self, shape):
+        # Frames of a new size (window resized) start a fresh buffer pool
+        if shape != self._shape:
+            self._shape = shape
+            self._free = queue.Queue()
+            self._allocated = 0
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            pass
+        if self._allocated < self.queue_size:
+            self._allocated += 1
+            return np.empty(shape, dtype=np.uint8)
+        if self.block:
+            return self._free.get()
+        return None
+
+    # Queue a copy of the surface; False if the frame was dropped
+    def capture(self, surface):
+        if self._error is not None:
+            raise self._error
+        pixels = pygame.surfarray.pixels3d(surface)
+        buffer = self._buffer(pixels.shape)
+        if buffer is None:
+            del pixels
+            self.dropped += 1
+            return False
+        np.copyto(buffer, pixels)
+        del pixels  # Unlock the surface
+        self._frames.put((buffer, self._free))
+        return True
+
+    def _write_loop(self):
+        chunk = []
+        try:
+            while True:
+                item = self._frames.get()
+                if item is None:
+                    break
+                buffer, free = item
+                # surfarray is (width, height, 3); write (height, width, 3) images
+                image = buffer.transpose(1, 0, 2)
+                if self.format == "png":
+                    surface = pygame.surfarray.make_surface(buffer)
+                    pygame.image.save(surface, os.path.join(self.path, f"{self.written:05d}.png"))
+                elif self.format == "npz":
+                    chunk.append(np.ascontiguousarray(image))
+                    if len(chunk) == self.chunk_frames:
+                        self._write_chunk(chunk)
+                        chunk = []
+                else:
+                    self._write_video(image)
+                free.put(buffer)
+                self.written += 1
+            if chunk:
+                self._write_chunk(chunk)
+        except Exception as error:
+            self._error = error
+        finally:
+            if self._encoder is not None:
+                self._encoder.stdin.close()
+                self._encoder.wait()
+
+    def _write_chunk(self, chunk):
+        base = os.path.splitext(self.path)[0]
+        np.savez_compressed(f"{base}_{self._chunks:05d}.npz", frames=np.stack(chunk))
+        self._chunks += 1
+
+    def _write_video(self, image):
+        height, width = image.shape[:2]
+        if self._encoder is None:
+            self._video_size = (width, height)
+            self._encoder = subprocess.Popen(
+                ["ffmpeg", "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24",
+                 "-s", f"{width}x{height}", "-r", str(self.fps), "-i", "-",
+                 "-pix_fmt", "yuv420p", self.path],
+                stdin=subprocess.PIPE,
+            )
+        # A video keeps the size of its first frame; frames of another size
+        # (window resized) are left out
+        if (width, height) == self._video_size:
+            self._encoder.stdin.write(np.ascontiguousarray(image).tobytes())
+
+    # Flush the queued frames and stop the writer
+    def close(self):
+        self._frames.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+
+
+# Simulation parameters shared by every boid script. Defaults are the values
+# used in Boid_Rand_Selection.py.
+@dataclass
+class SwarmConfig:
+    # Screen dimensions
+    width: int = 1200
+    height: int = 600
+
+    # Boid parameters
+    num_boids: int = 100
+    num_leaders: int = 1
+    boid_size: int = 10
+    max_boid_speed: float = 2
+    leader_speed: float = .5
+    turn_speed: float = 0.1
+    formation_distance: float = 20
+    formation_size: int = 4
+    formation_radius: float = 100
+    neighbor_radius: float = 10
+    avoid_distance: float = 15  # Minimum distance to avoid overlap
+
+    # Obstacle parameters
+    num_obstacles: int = 4
+    obstacle_size: int = 15
+    obstacle_margin: int = 15  # Keep spawned obstacles this far from the edges
+    obstacle_avoidance_distance: float = 30
+    obstacle_avoidance_force: float = 10
+    kp: float = 0.01
+    kn: float = 0.5
+    neighbor_avoidance_force: float = 15
+    # "index": exact, static cell list over the obstacles
+    # "field": repulsion baked on a FIELD_RESOLUTION pixel grid, one lookup
+    #          per boid however many obstacles there are
+    # "direct": every boid against every obstacle
+    obstacle_lookup: str = "index"
+    field_resolution: float = 2
+
+    # Boundary parameters
+    boundary_margin: int = 50
+    clamp_to_screen: bool = True  # Keep every boid BOID_SIZE away from the edges
+
+    # Behaviour switches
+    # "wander": leader keeps its heading and turns by up to pi/4 every
+    #           WANDER_INTERVAL frames (Boid_Rand_Selection.py, boid_rand.py)
+    # "turn":   leader turns by up to TURN_SPEED every frame (Boid_mouse.py)
+    leader_mode: str = "wander"
+    wander_interval: int = 120
+    # Extra follower speed per pixel of distance to the leader
+    leader_distance_gain: float = 0.02
+    # "separate": push away from every boid closer than AVOID_DISTANCE
+    # "average":  push along the mean direction away from boids within
+    #             NEIGHBOR_RADIUS, scaled by KN
+    avoidance_mode: str = "separate"
+    # "grid":  find neighbors with a cell list sized to the avoidance radius
+    # "dense": compare every follower with every boid
+    neighbor_search: str = "grid"
+    # Follower update implementation (swarm.kernels):
+    # "numpy":  the array code in swarm.step, the reference
+    # "numba":  loop kernel compiled with Numba, NumPy if it is not installed
+    # "python": the same kernel uncompiled, slow, for checking it
+    # "auto":   "numba" when Numba is installed, "numpy" otherwise
+    backend: str = "numpy"
+    # Frames between random leader re-selection, 0 disables it
+    leader_change_interval: int = 300
+    # How followers get their formation slots (swarm.assignment):
+    # "index":   by boid index, FORMATION_SIZE slots on the FORMATION_RADIUS
+    #            circle, as in the original scripts
+    # "optimal": on rings FORMATION_DISTANCE apart around each leader, by
+    #            minimum total distance, repaired after every leader change
+    slot_assignment: str = "index"
+    # Follower colors must not have r above this with low g and b
+    red_threshold: int = 1
+    # Compact storage for very large swarms: float32 positions, velocities
+    # and angles, colors as uint8 indices into a per-swarm palette and narrow
+    # integer timers and slots, about 40 bytes per boid. Runs are still
+    # reproducible from a seed but differ from the float64 ones.
+    compact_state: bool = False
@@ -0,0 +1,124 @@
+import argparse
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import scipy.sparse as sp
+
+from .spectral import laplacian  # Graph Laplacian L = D - A, shared with the spectral checks
+
+SHAPES = ("Square", "Circle", "Hexagon", "Rectangle")
+
+
+# Desired position of each of n agents, the offsets DesiredGen in
+# Homework/Hw4 stores on the nodes of Y, as an (n, 2) array
+def formation_offsets(n, shape):
+    index = np.arange(n)
+    if shape == "Square":
+        side_length = int(np.ceil(np.sqrt(n)))
+        i, j = np.divmod(index, side_length)
+        return np.column_stack((j, -i)).astype(np.float64)
+    if shape == "Circle":
+        radius = 5
+        theta = np.linspace(0, 2 * np.pi, n, endpoint=False)
+        return np.column_stack((radius * np.cos(theta), radius * np.sin(theta)))
+    if shape == "Hexagon":
+        side_length = int(np.ceil(np.sqrt(n)))
+        i, j = np.divmod(index, side_length)
+        # Shift every other column down by half a row
+        return np.column_stack((j * np.sqrt(3), -i * 1.5 - 0.75 * (j % 2)))
+    if shape == "Rectangle":
+        i, j = np.divmod(index, 3)
+        return np.column_stack((j * 3, -i)).astype(np.float64)
+    raise ValueError(f"Unknown formation {shape!r}; expected one of {', '.join(SHAPES)}")
+
+
+# Edges (i, i + 1) and (n - 1, 0): the ring AgentGen connects the agents with
+def ring_edges(n):
+    i = np.arange(n)
+    return np.column_stack((i, (i + 1) % n))
+
+
+# Positions (n, 2) and edges (m, 2) of a networkx graph whose nodes 0..n-1
+# carry a 'pos' attribute, like the graphs AgentGen builds
+def from_graph(graph):
+    n = graph.number_of_nodes()
+    positions = np.array([graph.nodes[i]["pos"] for i in range(n)], dtype=np.float64)
+    edges = np.array(list(graph.edges()), dtype=np.intp).reshape(-1, 2)
+    return positions, edges
+
+
+# Sparse adjacency matrix of an undirected graph. Self loops are dropped and
+# repeated edges count once, as in a networkx Graph.
+def adjacency(n, edges):
+    edges = np.asarray(edges, dtype=np.intp).reshape(-1, 2)
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    rows = np.concatenate((edges[:, 0], edges[:, 1]))
+    cols = np.concatenate((edges[:, 1], edges[:, 0]))
+    a = sp.coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n)).tocsr()
+    a.data[:] = 1.0
+    return a
+
+
+@dataclass
+class ConsensusResult:
+    positions: np.ndarray  # (n, 2)
+    iterations: int
+    residual: float  # Largest position change of the last iteration
+    converged: bool
+
+
+# Move the agents into formation with the consensus update of Consensus in
+# Homework/Hw4: every agent goes to the mean of its neighbors' positions and
+# its own desired offset,
+#
+#     x_i <- (sum of x_j over neighbors j + offset_i) / (degree_i + 1)
+#
+# which settles where (L + I) x = offsets. The adjacency matrix is built
+# once and all agents are updated together with one sparse product per
+# iteration. Iteration stops after max_iter or as soon as no coordinate
+# moves by more than tol.
+def consensus(positions, offsets, edges, max_iter=10000, tol=1e-9):
+    x = np.array(positions, dtype=np.float64).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=np.float64).reshape(-1, 2)
+    a = adjacency(len(x), edges)
+    scale = 1.0 / (np.asarray(a.sum(axis=1)).ravel() + 1.0)
+    scale = scale[:, None]
+
+    residual = np.inf
+    iterations = 0
+    while iterations < max_iter:
+        updated = (a @ x + offsets) * scale
+        residual = float(np.abs(updated - x).max()) if len(x) else 0.0
+        x = updated
+        iterations += 1
+        if residual <= tol:
+            break
+    return ConsensusResult(positions=x, iterations=iterations, residual=residual, converged=residual <= tol)
+
+
+# Random agents on a ring (like AgentGen) driven into `shape`
+def ring_consensus(n, shape, seed=None, max_iter=10000, tol=1e-9):
+    rng = np.random.default_rng(seed)
+    return consensus(rng.random((n, 2)) * 10, formation_offsets(n, shape), ring_edges(n), max_iter, tol)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive a ring of random agents into a formation by consensus")
+    parser.add_argument("--agents", type=int, default=200)
+    parser.add_argument("--shape", choices=SHAPES, default="Square")
+    parser.add_argument("--max-iter", type=int, default=10000)
+    parser.add_argument("--tol", type=float, default=1e-9)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = ring_consensus(args.agents, args.shape, args.seed, args.max_iter, args.tol)
+    elapsed = time.perf_counter() - start
+    state = "converged" if result.converged else "stopped"
+    print(f"{args.agents} agents {state} after {result.iterations} iterations "
+          f"(residual {result.residual:.2e}) in {elapsed:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+import argparse
+import math
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from .metrics import convergence_step
+from .obstacles import Obstacles, obstacle_clearance
+from .spatial import CellGrid
+from .state import follower_colors, formation_slots, leader_color, spawn
+from .step import CHUNK_SIZE, formation_targets, limit_speed, move, seek_formation
+from .step import avoid_neighbors as step_avoid_neighbors
+from .step import update_leaders as step_update_leaders
+
+
+# E independent swarms of the same configuration, each of N boids with L
+# leaders, as (E, N) arrays: row e is swarm e and column i its boid i.
+# Every swarm keeps its own random generator, leader-change timer and
+# obstacle layout, so row e evolves exactly as spawn(config, seeds[e])
+# stepped on its own would.
+@dataclass
+class Ensemble:
+    x: np.ndarray  # (E, N)
+    y: np.ndarray
+    vx: np.ndarray
+    vy: np.ndarray
+    angle: np.ndarray
+    is_leader: np.ndarray
+    color: np.ndarray  # (E, N, 3) uint8, or (E, N) palette indices
+    wander_timer: np.ndarray
+    leaders: np.ndarray  # (E, L) sorted boid indices within each swarm
+    followers: np.ndarray  # (E, N - L)
+    slot: np.ndarray  # (N,) the same formation assignment in every swarm
+    group: np.ndarray
+    # The obstacles of every swarm in one set: swarm e owns obstacles
+    # e * num_obstacles to (e + 1) * num_obstacles - 1
+    obstacles: Obstacles
+    num_obstacles: int
+    rngs: list  # One np.random.Generator per swarm
+    seeds: list
+    leader_change_timer: np.ndarray  # (E,)
+    frame: int = 0
+    palette: np.ndarray = None  # (E, PALETTE_SIZE, 3) of compact states
+
+    @property
+    def num_swarms(self):
+        return self.x.shape[0]
+
+    @property
+    def num_boids(self):
+        return self.x.shape[1]
+
+
+# Spawn one swarm per seed the way spawn() does and stack them
+def spawn_ensemble(config, seeds):
+    if config.slot_assignment != "index":
+        raise ValueError("Ensembles share one formation assignment; use slot_assignment=\"index\"")
+    seeds = list(seeds)
+    states = [spawn(config, seed) for seed in seeds]
+    slot, group = formation_slots(config.num_boids, config)
+    return Ensemble(
+        x=np.stack([s.x for s in states]),
+        y=np.stack([s.y for s in states]),
+        vx=np.stack([s.vx for s in states]),
+        vy=np.stack([s.vy for s in states]),
+        angle=np.stack([s.angle for s in states]),
+        is_leader=np.stack([s.is_leader for s in states]),
+        color=np.stack([s.color for s in states]),
+        wander_timer=np.stack([s.wander_timer for s in states]),
+        leaders=np.stack([s.leaders for s in states]),
+        followers=np.stack([s.followers for s in states]),
+        slot=slot,
+        group=group,
+        obstacles=Obstacles(np.concatenate([s.obstacles.center for s in states]),
+                            np.concatenate([s.obstacles.size for s in states]),
+                            np.concatenate([s.obstacles.kind for s in states])),
+        num_obstacles=config.num_obstacles,
+        rngs=[s.rng for s in states],
+        seeds=seeds,
+        leader_change_timer=np.zeros(len(states), dtype=np.int64),
+        palette=np.stack([s.palette for s in states]) if config.compact_state else None,
+    )
+
+
+# The ensemble seen as one swarm of E * N boids, with 1-D views of the
+# (E, N) arrays. Its E * L leaders are those of all swarms in order, and
+# group is remapped so that leaders[group[i] % len(leaders)] is the leader
+# of boid i in its own swarm; seek_formation, formation_targets and move of
+# swarm.step then work on it unchanged.
+class _Flat:
+    def __init__(self, ensemble):
+        e, n = ensemble.x.shape
+        num_leaders = ensemble.leaders.shape[1]
+        offset = np.arange(e)[:, None] * n
+        self.x = ensemble.x.reshape(-1)
+        self.y = ensemble.y.reshape(-1)
+        self.vx = ensemble.vx.reshape(-1)
+        self.vy = ensemble.vy.reshape(-1)
+        self.angle = ensemble.angle.reshape(-1)
+        self.wander_timer = ensemble.wander_timer.reshape(-1)
+        self.leaders = (ensemble.leaders + offset).reshape(-1)
+        self.followers = (ensemble.followers + offset).reshape(-1)
+        self.slot = np.tile(ensemble.slot, e)
+        if num_leaders:
+            self.group = (np.arange(e)[:, None] * num_leaders + ensemble.group % num_leaders).reshape(-1)
+        else:
+            self.group = np.tile(ensemble.group, e)
+
+
+# step.update_leaders for every swarm at once; only the random turns are
+# drawn swarm by swarm, from each swarm's own generator
+def update_leaders(ensemble, flat, config):
+    e, num_leaders = ensemble.leaders.shape
+
+    def uniform(low, high, which):
+        counts = which.reshape(e, num_leaders).sum(axis=1).tolist()
+        return np.concatenate([rng.uniform(low, high, size=count) for rng, count in zip(ensemble.rngs, counts)])
+
+    step_update_leaders(flat, config, uniform)
+
+
+# One CellGrid over every swarm. Swarm e's cells take rows e * (ny + 1) to
+# e * (ny + 1) + ny - 1 of a grid of unit cells and the row after them stays
+# empty, so the 3x3 cells around a boid never reach into another swarm.
+# Members of each cell come in the order a swarm's own grid gives them, so
+# sums over neighbors match a single swarm's exactly. Returns the grid and
+# every boid's position on it. With the dense search each swarm is a single
+# cell.
+def ensemble_grid(ensemble, config, cell_size, dense=False):
+    e, n = ensemble.x.shape
+    if dense:
+        nx = ny = 1
+        cx = np.zeros(e * n)
+        cy = np.zeros(e * n)
+    else:
+        nx = max(1, math.ceil(config.width / cell_size))
+        ny = max(1, math.ceil(config.height / cell_size))
+        cx = np.clip(ensemble.x.reshape(-1) // cell_size, 0, nx - 1)
+        cy = np.clip(ensemble.y.reshape(-1) // cell_size, 0, ny - 1)
+    gx = cx + 0.5
+    gy = cy + np.repeat(np.arange(e) * (ny + 1), n) + 0.5
+    return CellGrid(nx, e * (ny + 1), 1).rebuild(gx, gy), gx, gy
+
+
+# step.avoid_neighbors for the followers of every swarm, searched on the
+# grid over all swarms
+def avoid_neighbors(ensemble, flat, config, followers):
+    radius = config.avoid_distance if config.avoidance_mode == "separate" else config.neighbor_radius
+    grid = None
+    if radius > 0:
+        grid = ensemble_grid(ensemble, config, radius, dense=config.neighbor_search != "grid")
+    return step_avoid_neighbors(flat, config, followers, grid=grid)
+
+
+# Repulsion of every follower by the obstacles of its own swarm, tested
+# against each of them (obstacle_lookup is not used: the "index" lookup
+# gives the same forces, the "field" one an approximation of them)
+def avoid_obstacles(ensemble, flat, config, followers):
+    fx = np.zeros(len(followers))
+    fy = np.zeros(len(followers))
+    m = ensemble.num_obstacles
+    if m:
+        clearance = obstacle_clearance(config)
+        swarm = followers // ensemble.num_boids
+        # Bound the temporaries to CHUNK_SIZE * N pairs
+        rows_per_chunk = max(1, CHUNK_SIZE * ensemble.num_boids // m)
+        for start in range(0, len(followers), rows_per_chunk):
+            rows = np.arange(start, min(start + rows_per_chunk, len(followers)))
+            row = np.repeat(rows, m)
+            index = swarm[row] * m + np.tile(np.arange(m), len(rows))
+            ux, uy, distance = ensemble.obstacles.surface(flat.x[followers[row]], flat.y[followers[row]], index)
+            close = distance < clearance
+            fx += np.bincount(row[close], weights=ux[close], minlength=len(fx))
+            fy += np.bincount(row[close], weights=uy[close], minlength=len(fy))
+    return config.obstacle_avoidance_force * fx, config.obstacle_avoidance_force * fy
+
+
+def update_followers(ensemble, flat, config):
+    followers = flat.followers
+    if len(followers) == 0:
+        return
+    if len(flat.leaders) == 0:
+        move(flat, config, followers)
+        return
+
+    vx, vy = seek_formation(flat, config, followers)
+    nx, ny = avoid_neighbors(ensemble, flat, config, followers)
+    ox, oy = avoid_obstacles(ensemble, flat, config, followers)
+    vx, vy = limit_speed(vx + nx + ox, vy + ny + oy, config.max_boid_speed)
+    flat.vx[followers] = vx
+    flat.vy[followers] = vy
+    move(flat, config, followers)
+
+
+# step.change_leaders with a timer per swarm; swarms that are due pick their
+# new leaders from their own generators
+def change_leaders(ensemble, config):
+    if config.leader_change_interval <= 0:
+        return
+    ensemble.leader_change_timer += 1
+    due = np.flatnonzero(ensemble.leader_change_timer >= config.leader_change_interval)
+    if len(due) == 0:
+        return
+    ensemble.leader_change_timer[due] = 0
+
+    n = ensemble.num_boids
+    num_new_leaders = min(config.num_leaders, n)
+    for e in due.tolist():
+        rng = ensemble.rngs[e]
+        palette = None if ensemble.palette is None else ensemble.palette[e]
+        # Make current leaders followers with a non-red color
+        current = ensemble.leaders[e]
+        ensemble.color[e, current] = follower_colors(rng, len(current), config, palette)
+
+        # Randomly select new leaders from all boids
+        new_leaders = rng.choice(n, size=num_new_leaders, replace=False)
+        ensemble.is_leader[e] = False
+        ensemble.is_leader[e, new_leaders] = True
+        ensemble.color[e, new_leaders] = leader_color(palette)
+    ensemble.leaders = np.stack([np.flatnonzero(row) for row in ensemble.is_leader])
+    ensemble.followers = np.stack([np.flatnonzero(~row) for row in ensemble.is_leader])
+
+
+# Advance every swarm of the ensemble by one frame, as step() does one swarm
+def step_ensemble(ensemble, config):
+    flat = _Flat(ensemble)
+    update_leaders(ensemble, flat, config)
+    update_followers(ensemble, flat, config)
+    change_leaders(ensemble, config)
+    ensemble.frame += 1
+
+
+# Mean distance of each swarm's followers from their formation points, (E,)
+def formation_errors(ensemble, config):
+    e = ensemble.num_swarms
+    if ensemble.followers.shape[1] == 0 or ensemble.leaders.shape[1] == 0:
+        return np.zeros(e)
+    flat = _Flat(ensemble)
+    followers = flat.followers
+    _, formation_x, formation_y = formation_targets(flat, config, followers)
+    error = np.hypot(formation_x - flat.x[followers], formation_y - flat.y[followers])
+    return error.reshape(e, -1).mean(axis=1)
+
+
+# Number of boid pairs closer than `distance` in each swarm, (E,)
+def count_collisions(ensemble, config, distance):
+    grid, gx, gy = ensemble_grid(ensemble, config, distance)
+    row, col = grid.candidates(gx, gy)
+    pairs = row < col
+    row, col = row[pairs], col[pairs]
+    x, y = ensemble.x.reshape(-1), ensemble.y.reshape(-1)
+    dx = x[row] - x[col]
+    dy = y[row] - y[col]
+    close = dx * dx + dy * dy < distance * distance
+    return np.bincount(row[close] // ensemble.num_boids, minlength=ensemble.num_swarms)
+
+
+# Per-swarm summary of an ensemble run, with the statistics of
+# swarm.sweep.evaluate; entry e belongs to seeds[e]
+@dataclass
+class EnsembleResult:
+    seeds: list
+    mean_formation_error: np.ndarray  # (E,)
+    final_formation_error: np.ndarray
+    collision_count: np.ndarray
+    convergence_step: np.ndarray  # -1 where the swarm never settles
+    ensemble: Ensemble  # Final state
+    elapsed: float  # Wall-clock seconds
+
+    # One sweep-style dict per swarm
+    def records(self):
+        return [{
+            "seed": seed,
+            "mean_formation_error": float(self.mean_formation_error[e]),
+            "final_formation_error": float(self.final_formation_error[e]),
+            "collision_count": int(self.collision_count[e]),
+            "convergence_step": None if self.convergence_step[e] < 0 else int(self.convergence_step[e]),
+        } for e, seed in enumerate(self.seeds)]
+
+
+# Run one swarm per seed for `steps` steps, all in the same vectorized step,
+# and summarize each. Collisions are pairs closer than BOID_SIZE, counted
+# every step; a swarm has converged from the first step after which its
+# formation error stays within settle_fraction * FORMATION_RADIUS.
+def run_ensemble(config, seeds, steps, settle_fraction=0.1):
+    ensemble = spawn_ensemble(config, seeds)
+    errors = np.empty((steps, ensemble.num_swarms))
+    collisions = np.zeros(ensemble.num_swarms, dtype=np.int64)
+    start = time.perf_counter()
+    for i in range(steps):
+        step_ensemble(ensemble, config)
+        errors[i] = formation_errors(ensemble, config)
+        collisions += count_collisions(ensemble, config, config.boid_size)
+    elapsed = time.perf_counter() - start
+
+    tolerance = settle_fraction * config.formation_radius
+    settled = [convergence_step(errors[:, e], tolerance) for e in range(ensemble.num_swarms)]
+    return EnsembleResult(
+        seeds=ensemble.seeds,
+        mean_formation_error=errors.mean(axis=0) if steps else np.zeros(ensemble.num_swarms),
+        final_formation_error=errors[-1] if steps else np.zeros(ensemble.num_swarms),
+        collision_count=collisions,
+        convergence_step=np.array([-1 if s is None else s for s in settled], dtype=np.int64),
+        ensemble=ensemble,
+        elapsed=elapsed,
+    )
+
+
+def main():
+    from .presets import PRESETS
+
+    parser = argparse.ArgumentParser(description="Run many seeds of one scenario as a single ensemble")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="random_selection")
+    parser.add_argument("--swarms", type=int, default=200, help="Ensemble size E (seeds first-seed..)")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--steps", type=int, default=300)
+    parser.add_argument("--boids", type=int, default=None)
+    parser.add_argument("--compare", action="store_true", help="Also time the seeds one by one with swarm.sweep")
+    args = parser.parse_args()
+
+    params = {} if args.boids is None else {"num_boids": args.boids}
+    config = PRESETS[args.preset](**params)
+    seeds = range(args.first_seed, args.first_seed + args.swarms)
+    result = run_ensemble(config, seeds, args.steps)
+    print(f"{args.swarms} swarms x {config.num_boids} boids, {args.steps} steps in {result.elapsed:.2f} s "
+          f"({args.swarms * args.steps / result.elapsed:.0f} swarm-steps/s)")
+
+    settled = result.convergence_step >= 0
+    print(f"mean formation error {result.mean_formation_error.mean():.2f} "
+          f"(std {result.mean_formation_error.std():.2f} over swarms), "
+          f"final {result.final_formation_error.mean():.2f}")
+    print(f"collisions per swarm {result.collision_count.mean():.1f}, "
+          f"{settled.mean():.0%} converged" +
+          (f", median step {np.median(result.convergence_step[settled]):.0f}" if settled.any() else ""))
+
+    if args.compare:
+        from .sweep import evaluate
+        start = time.perf_counter()
+        for seed in seeds:
+            evaluate(args.preset, params, seed, args.steps)
+        elapsed = time.perf_counter() - start
+        print(f"one by one: {elapsed:.2f} s ({args.swarms * args.steps / elapsed:.0f} swarm-steps/s, "
+              f"ensemble {elapsed / result.elapsed:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
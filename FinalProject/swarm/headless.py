@@ -0,0 +1,119 @@
+import argparse
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from .config import SwarmConfig
+from .state import spawn
+from .step import step
+
+
+# Per-boid history of a run, one row per recorded step
+@dataclass
+class Trajectory:
+    x: np.ndarray  # (T, N)
+    y: np.ndarray
+    vx: np.ndarray
+    vy: np.ndarray
+    angle: np.ndarray
+    is_leader: np.ndarray  # (T, N) bool
+
+
+@dataclass
+class RunResult:
+    state: object  # Final SwarmState
+    trajectory: object  # Trajectory, or None when nothing was recorded
+    elapsed: float  # Wall-clock seconds spent stepping
+
+
+def _empty_trajectory(rows, n):
+    return Trajectory(
+        x=np.empty((rows, n)),
+        y=np.empty((rows, n)),
+        vx=np.empty((rows, n)),
+        vy=np.empty((rows, n)),
+        angle=np.empty((rows, n)),
+        is_leader=np.empty((rows, n), dtype=bool),
+    )
+
+
+def _record(trajectory, row, state):
+    trajectory.x[row] = state.x
+    trajectory.y[row] = state.y
+    trajectory.vx[row] = state.vx
+    trajectory.vy[row] = state.vy
+    trajectory.angle[row] = state.angle
+    trajectory.is_leader[row] = state.is_leader
+
+
+# Run the simulation without a window, event pump or frame cap.
+#
+# Every call to step() is one fixed frame of the windowed scripts, so a run is
+# reproducible from (config, seed) alone. The state after every `record_every`
+# steps is written to a preallocated Trajectory; pass record_every=0 to keep
+# only the final state. A swarm.replay.TrajectoryWriter passed as `log` gets
+# every step appended to its file instead of memory, and a
+# swarm.metrics.FormationMetrics passed as `metrics` is updated every step.
+def run(steps, seed=None, config=None, record_every=1, state=None, log=None, metrics=None):
+    if config is None:
+        config = SwarmConfig()
+    if state is None:
+        state = spawn(config, seed)
+
+    trajectory = None
+    if record_every > 0:
+        trajectory = _empty_trajectory(steps // record_every, state.num_boids)
+
+    start = time.perf_counter()
+    for i in range(1, steps + 1):
+        step(state, config, metrics=metrics)
+        if log is not None:
+            log.append(state)
+        if trajectory is not None and i % record_every == 0:
+            _record(trajectory, i // record_every - 1, state)
+    elapsed = time.perf_counter() - start
+
+    return RunResult(state=state, trajectory=trajectory, elapsed=elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the boid simulation headless")
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--boids", type=int, default=SwarmConfig.num_boids)
+    parser.add_argument("--record-every", type=int, default=1)
+    parser.add_argument("--output", help="Save the trajectory to this .npz file")
+    parser.add_argument("--log", help="Append every step to this binary log (see swarm.replay)")
+    parser.add_argument("--metrics", help="Save formation metrics (see swarm.metrics) to this .json file")
+    args = parser.parse_args()
+    if args.steps < 1:
+        parser.error("--steps must be at least 1")
+
+    from .metrics import FormationMetrics
+    from .replay import TrajectoryWriter
+    config = SwarmConfig(num_boids=args.boids)
+    log = TrajectoryWriter(args.log, args.boids, config.width, config.height, args.steps) if args.log else None
+    metrics = FormationMetrics(config) if args.metrics else None
+    result = run(args.steps, args.seed, config, record_every=args.record_every if args.output else 0, log=log,
+                 metrics=metrics)
+    if log:
+        log.close()
+    print(f"{args.steps} steps of {args.boids} boids in {result.elapsed:.2f} s "
+          f"({args.steps / result.elapsed:.0f} steps/s, {args.steps / result.elapsed / 60:.1f}x real time)")
+
+    if metrics:
+        metrics.export(args.metrics)
+        summary = metrics.summary()
+        print(f"formation error {summary['formation_error']['mean']:.2f} mean, "
+              f"{summary['formation_error']['last']:.2f} final; "
+              f"{summary['spacing_violations']['mean']:.2f} spacing violations and "
+              f"{summary['obstacle_penetrations']['mean']:.2f} obstacle penetrations per step")
+
+    if args.output:
+        t = result.trajectory
+        np.savez_compressed(args.output, x=t.x, y=t.y, vx=t.vx, vy=t.vy, angle=t.angle, is_leader=t.is_leader)
+
+
+if __name__ == "__main__":
+    main()
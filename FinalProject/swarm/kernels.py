@@ -0,0 +1,237 @@
+import argparse
+import copy
+import math
+import time
+import warnings
+
+import numpy as np
+
+from .spatial import CellGrid, build_grid
+from .step import formation_offsets
+
+try:
+    import numba
+except ImportError:  # Numba is optional; the kernels then run as plain Python
+    numba = None
+
+BACKENDS = ("numpy", "numba", "python", "auto")
+
+
+def _jit(function):
+    if numba is None:
+        return function
+    return numba.njit(cache=True)(function)
+
+
+# The follower update of step.update_followers (formation seeking, neighbor
+# avoidance, speed limit and move) as explicit per-follower loops, so the
+# branches (angle wrap, turn clamp, gated forces) cost no temporaries.
+# Compiled with Numba when it is installed, plain Python otherwise.
+#
+# The first loop only reads positions and the second moves everyone, which
+# keeps the "all followers see the same snapshot" rule of step(). Neighbors
+# are visited in the order the NumPy grid path sums them, so both backends
+# agree to rounding.
+def _followers_kernel(x, y, vx, vy, angle, followers, leader, offset_x, offset_y, order, cell_start, grid_nx,
+                      grid_ny, cell_size, obstacle_fx, obstacle_fy, kp, leader_distance_gain, max_speed,
+                      turn_speed, radius, separate, kn, neighbor_force, obstacle_force, clamp, boid_size, width,
+                      height):
+    n = len(followers)
+    new_vx = np.empty(n)
+    new_vy = np.empty(n)
+    for k in range(n):
+        i = followers[k]
+        xi = x[i]
+        yi = y[i]
+
+        # Proportional movement towards the formation slot
+        lx = x[leader[k]]
+        ly = y[leader[k]]
+        fx = lx + offset_x[k]
+        fy = ly + offset_y[k]
+        distance_to_formation = math.hypot(fx - xi, fy - yi)
+        distance_to_leader = math.hypot(lx - xi, ly - yi)
+        desired_angle = math.atan2(fy - yi, fx - xi)
+        speed = min(kp * distance_to_formation + leader_distance_gain * distance_to_leader, max_speed)
+
+        # Turn towards it by at most turn_speed
+        diff = desired_angle - angle[i]
+        if diff > math.pi:
+            diff -= 2 * math.pi
+        if diff < -math.pi:
+            diff += 2 * math.pi
+        a = angle[i] + min(max(diff, -turn_speed), turn_speed)
+        angle[i] = a
+        svx = speed * math.cos(a)
+        svy = speed * math.sin(a)
+
+        # Unit vectors away from every other boid within the radius
+        ax = 0.0
+        ay = 0.0
+        count = 0
+        if radius > 0:
+            cx = min(max(int(xi // cell_size), 0), grid_nx - 1)
+            cy = min(max(int(yi // cell_size), 0), grid_ny - 1)
+            for oy in range(-1, 2):
+                for ox in range(-1, 2):
+                    ncx = cx + ox
+                    ncy = cy + oy
+                    if ncx < 0 or ncx >= grid_nx or ncy < 0 or ncy >= grid_ny:
+                        continue
+                    cell = ncy * grid_nx + ncx
+                    for m in range(cell_start[cell], cell_start[cell + 1]):
+                        j = order[m]
+                        if j == i:
+                            continue
+                        dx = xi - x[j]
+                        dy = yi - y[j]
+                        if dx * dx + dy * dy < radius * radius:
+                            d = math.hypot(dx, dy)
+                            if d > 0:
+                                ax += dx / d
+                                ay += dy / d
+                            else:
+                                ax += 1.0
+                            count += 1
+        if separate:
+            nfx = neighbor_force * ax
+            nfy = neighbor_force * ay
+        else:
+            # Steer along the mean away direction
+            norm = math.hypot(ax, ay)
+            gain = kn * neighbor_force if count > 0 else 0.0
+            if norm > 0:
+                nfx = gain * (ax / norm)
+                nfy = gain * (ay / norm)
+            else:
+                nfx = gain
+                nfy = 0.0
+
+        tvx = svx + nfx + obstacle_force * obstacle_fx[k]
+        tvy = svy + nfy + obstacle_force * obstacle_fy[k]
+        total = math.hypot(tvx, tvy)
+        if total > max_speed:
+            tvx *= max_speed / total
+            tvy *= max_speed / total
+        new_vx[k] = tvx
+        new_vy[k] = tvy
+
+    for k in range(n):
+        i = followers[k]
+        vx[i] = new_vx[k]
+        vy[i] = new_vy[k]
+        nx = x[i] + new_vx[k]
+        ny = y[i] + new_vy[k]
+        if clamp:
+            nx = min(max(nx, boid_size), width - boid_size)
+            ny = min(max(ny, boid_size), height - boid_size)
+        x[i] = nx
+        y[i] = ny
+
+
+_compiled_kernel = _jit(_followers_kernel)
+_warned = False
+
+
+# Whether the follower update of this backend runs the loop kernel. "numba"
+# without Numba installed warns once and keeps the NumPy path.
+def uses_kernel(backend):
+    global _warned
+    if backend == "python":
+        return True
+    if backend == "auto":
+        return numba is not None
+    if backend == "numba":
+        if numba is None and not _warned:
+            warnings.warn("Numba is not installed; using the NumPy backend", RuntimeWarning, stacklevel=3)
+            _warned = True
+        return numba is not None
+    if backend != "numpy":
+        raise ValueError(f"Unknown backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    return False
+
+
+# update_followers with the loop kernel; there must be leaders and followers
+def update_followers(state, config, profiler):
+    followers = state.followers
+    with profiler.phase("obstacles"):
+        ox, oy = state.obstacles.repulsion(state.x[followers], state.y[followers], config)
+
+    with profiler.phase("neighbors"):
+        separate = config.avoidance_mode == "separate"
+        radius = config.avoid_distance if separate else config.neighbor_radius
+        if config.neighbor_search == "grid":
+            grid = build_grid(state, config, radius) if radius > 0 else CellGrid(1, 1, 1)
+        else:
+            # Every boid in one cell is the dense search
+            grid = CellGrid(1, 1, math.inf).rebuild(np.zeros(state.num_boids), np.zeros(state.num_boids))
+
+    # Formation, neighbor forces, speed limit and move are fused, so the
+    # kernel is timed as a whole under "formation"
+    with profiler.phase("formation"):
+        kernel = _followers_kernel if config.backend == "python" else _compiled_kernel
+        leader = state.leaders[state.group[followers] % len(state.leaders)]
+        offset_x, offset_y = formation_offsets(state, config, followers)
+        kernel(state.x, state.y, state.vx, state.vy, state.angle, followers, leader, offset_x, offset_y,
+               grid.order, grid.cell_start, grid.nx, grid.ny, float(grid.cell_size), ox, oy, float(config.kp),
+               float(config.leader_distance_gain), float(config.max_boid_speed), float(config.turn_speed),
+               float(radius), separate, float(config.kn), float(config.neighbor_avoidance_force),
+               float(config.obstacle_avoidance_force), config.clamp_to_screen, float(config.boid_size),
+               float(config.width), float(config.height))
+
+
+# Largest difference in position, velocity and angle between `steps` steps of
+# the NumPy reference and of `backend` from the same start
+def check_equivalence(config, backend="numba", steps=200, seed=0):
+    from dataclasses import replace
+
+    from .state import spawn
+    from .step import step
+
+    reference = spawn(config, seed)
+    candidate = copy.deepcopy(reference)
+    reference_config = replace(config, backend="numpy")
+    candidate_config = replace(config, backend=backend)
+    for _ in range(steps):
+        step(reference, reference_config)
+        step(candidate, candidate_config)
+    return max(float(np.abs(getattr(reference, name) - getattr(candidate, name)).max())
+               for name in ("x", "y", "vx", "vy", "angle"))
+
+
+def main():
+    from dataclasses import replace
+
+    from .presets import PRESETS
+    from .state import spawn
+    from .step import step
+
+    parser = argparse.ArgumentParser(description="Check the loop-kernel backend against NumPy and time both")
+    parser.add_argument("--backend", choices=BACKENDS, default="numba")
+    parser.add_argument("--boids", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--check-steps", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.backend in ("numba", "auto") and numba is None:
+        print("Numba is not installed; the kernel would run as plain Python (--backend python)")
+        return
+    for name, preset in PRESETS.items():
+        difference = check_equivalence(preset(num_boids=200), args.backend, args.check_steps)
+        print(f"{name:>16}: max difference to NumPy after {args.check_steps} steps {difference:.2e}")
+
+    for n in args.boids:
+        times = {}
+        for backend in ("numpy", args.backend):
+            config = replace(PRESETS["random_selection"](num_boids=n), backend=backend)
+            state = spawn(config, 0)
+            step(state, config)  # Compile and build the obstacle index
+            start = time.perf_counter()
+            for _ in range(args.steps):
+                step(state, config)
+            times[backend] = 1000 * (time.perf_counter() - start) / args.steps
+        print(f"N={n:<7} numpy {times['numpy']:8.3f} ms/step  {args.backend} {times[args.backend]:8.3f} ms/step")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import json
+import math
+
+import numpy as np
+
+from .spatial import CellGrid
+from .step import formation_targets
+
+
+# Mean distance of the followers from their formation points
+def formation_error(state, config):
+    followers = state.followers
+    if len(followers) == 0 or len(state.leaders) == 0:
+        return 0.0
+    _, formation_x, formation_y = formation_targets(state, config, followers)
+    return float(np.hypot(formation_x - state.x[followers], formation_y - state.y[followers]).mean())
+
+
+# Number of boid pairs closer than `distance`, each pair counted once
+def count_collisions(state, config, distance):
+    grid = CellGrid(config.width, config.height, distance).rebuild(state.x, state.y)
+    row, col = grid.candidates(state.x, state.y)
+    pairs = row < col
+    row, col = row[pairs], col[pairs]
+    dx = state.x[row] - state.x[col]
+    dy = state.y[row] - state.y[col]
+    return int(np.count_nonzero(dx * dx + dy * dy < distance * distance))
+
+
+# First step after which the error stays at or below `tolerance`, or None if
+# the run never settles
+def convergence_step(errors, tolerance):
+    above = np.flatnonzero(np.asarray(errors) > tolerance)
+    if len(above) == 0:
+        return 0
+    if above[-1] == len(errors) - 1:
+        return None
+    return int(above[-1] + 1)
+
+
+# Count, mean, standard deviation and range of a stream of values, updated
+# in O(1) memory (Welford's algorithm, merged per batch)
+class RunningStat:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.last = math.nan
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        n = len(values)
+        if n == 0:
+            return
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self._m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.last = float(values[-1])
+
+    @property
+    def std(self):
+        return math.sqrt(self._m2 / self.count) if self.count else 0.0
+
+    def summary(self):
+        if self.count == 0:
+            return {"count": 0}
+        return {"count": self.count, "mean": self.mean, "std": self.std, "min": self.min, "max": self.max,
+                "last": self.last}
+
+
+# Fixed-bin histogram over [low, high); values outside land in the under-
+# and overflow counts
+class Histogram:
+    def __init__(self, low, high, bins=32):
+        self.edges = np.linspace(low, high, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        low, high = self.edges[0], self.edges[-1]
+        self.underflow += int(np.count_nonzero(values < low))
+        self.overflow += int(np.count_nonzero(values >= high))
+        inside = values[(values >= low) & (values < high)]
+        bins = len(self.counts)
+        index = np.minimum(((inside - low) * (bins / (high - low))).astype(np.intp), bins - 1)
+        self.counts += np.bincount(index, minlength=bins)
+
+    def summary(self):
+        return {"edges": self.edges.tolist(), "counts": self.counts.tolist(), "underflow": self.underflow,
+                "overflow": self.overflow}
+
+
+# Formation quality of a run, updated by step() as it goes: pass the same
+# FormationMetrics to every step(state, config, metrics=metrics) call, read
+# summary() at any time and export() it at the end. Memory does not grow with
+# the length of the run.
+#
+# Each step records:
+# - formation error: distance of every follower from its target given by
+#   step.formation_targets (its formation slot for either SLOT_ASSIGNMENT),
+#   after the step
+# - spacing: the distance from each follower to its nearest neighbor within
+#   the avoidance radius, and the followers with one closer than
+#   AVOID_DISTANCE (violations). These come from the pair distances the
+#   avoidance pass computes anyway, so they describe the positions the
+#   followers reacted to, and neighbors beyond the avoidance radius (the
+#   smaller NEIGHBOR_RADIUS in "average" mode) are not seen.
+# - obstacle penetrations: followers inside an obstacle, from the surface
+#   distances of the obstacle lookup
+# - settling: steps from a leader change until the mean formation error has
+#   stayed within settle_fraction * FORMATION_RADIUS for `hold` steps
+#   (changes that come before the swarm settles count as unsettled)
+class FormationMetrics:
+    def __init__(self, config, settle_fraction=0.1, hold=30, bins=32):
+        self.tolerance = settle_fraction * config.formation_radius
+        self.hold = hold
+        self.steps = 0
+        self.formation_error = RunningStat()  # Per-step mean over followers
+        self.follower_error = Histogram(0.0, 4 * config.formation_radius, bins)
+        radius = config.avoid_distance if config.avoidance_mode == "separate" else config.neighbor_radius
+        self.avoid_distance = config.avoid_distance
+        self.nearest_neighbor = Histogram(0.0, max(radius, 1e-9), bins)
+        self.spacing_violations = RunningStat()  # Followers per step
+        self.obstacle_penetrations = RunningStat()  # Followers per step
+        self.penetration_depth = RunningStat()
+        self.settle_steps = RunningStat()
+        self.settle_histogram = Histogram(0.0, max(config.leader_change_interval, hold + 1), bins)
+        self.unsettled = 0
+        self._leaders = None
+        self._changed_at = 0  # Step of the last leader change (or the start)
+        self._settling = True
+        self._within = 0  # Consecutive steps within the tolerance
+        self._nearest = None
+
+    # Pair distances of the avoidance pass: rows index the followers
+    def observe_neighbors(self, num_followers, row, distance):
+        if self._nearest is None or len(self._nearest) != num_followers:
+            self._nearest = np.full(num_followers, np.inf)
+        np.minimum.at(self._nearest, row, distance)
+
+    # Nearest obstacle surface of every follower (inf when out of reach)
+    def observe_obstacles(self, nearest):
+        inside = nearest[nearest < 0]
+        self.obstacle_penetrations.add([len(inside)])
+        self.penetration_depth.add(-inside)
+
+    def end_step(self, state, config):
+        self.steps += 1
+        # Without observed pairs (an avoidance radius of 0) no follower has a
+        # neighbor in reach
+        if self._nearest is None or len(self._nearest) != len(state.followers):
+            self._nearest = np.full(len(state.followers), np.inf)
+        nearest = self._nearest[np.isfinite(self._nearest)]
+        self.nearest_neighbor.add(nearest)
+        self.spacing_violations.add([np.count_nonzero(nearest < self.avoid_distance)])
+        self._nearest.fill(np.inf)
+
+        followers = state.followers
+        if len(followers) and len(state.leaders):
+            _, formation_x, formation_y = formation_targets(state, config, followers)
+            error = np.hypot(formation_x - state.x[followers], formation_y - state.y[followers])
+            self.follower_error.add(error)
+            mean_error = float(error.mean())
+        else:
+            mean_error = 0.0
+        self.formation_error.add([mean_error])
+
+        # A new leader registry means the leaders changed this step
+        if self._leaders is not None and state.leaders is not self._leaders:
+            if self._settling:
+                self.unsettled += 1
+            self._changed_at = self.steps
+            self._settling = True
+            self._within = 0
+        self._leaders = state.leaders
+        if self._settling:
+            self._within = self._within + 1 if mean_error <= self.tolerance else 0
+            if self._within >= self.hold:
+                settled = self.steps - self.hold + 1 - self._changed_at
+                self.settle_steps.add([settled])
+                self.settle_histogram.add([settled])
+                self._settling = False
+
+    def summary(self):
+        return {
+            "steps": self.steps,
+            "formation_error": self.formation_error.summary(),
+            "follower_error_histogram": self.follower_error.summary(),
+            "nearest_neighbor_histogram": self.nearest_neighbor.summary(),
+            "spacing_violations": self.spacing_violations.summary(),
+            "obstacle_penetrations": self.obstacle_penetrations.summary(),
+            "penetration_depth": self.penetration_depth.summary(),
+            "settle_steps": self.settle_steps.summary(),
+            "settle_histogram": self.settle_histogram.summary(),
+            "unsettled_leader_changes": self.unsettled,
+        }
+
+    def export(self, path):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
@@ -0,0 +1,204 @@
+import math
+
+import numpy as np
+
+from .spatial import CellGrid
+
+# Obstacle shapes
+CIRCLE = 0
+RECTANGLE = 1
+
+
+# Static obstacles of mixed shapes and sizes. size[i] is (radius, radius) for
+# a circle and the (half width, half height) of an axis-aligned rectangle.
+#
+# Obstacles never move, so the lookup structures used for avoidance are built
+# on first use and cached on the set.
+class Obstacles:
+    def __init__(self, center, size, kind=None):
+        self.center = np.asarray(center, dtype=np.float64).reshape(-1, 2)
+        self.size = np.asarray(size, dtype=np.float64).reshape(-1, 2)
+        if kind is None:
+            kind = np.full(len(self.center), CIRCLE)
+        self.kind = np.asarray(kind, dtype=np.int8)
+        self._lookups = {}
+
+    @classmethod
+    def circles(cls, center, radius):
+        center = np.asarray(center, dtype=np.float64).reshape(-1, 2)
+        radius = np.broadcast_to(np.asarray(radius, dtype=np.float64), (len(center),))
+        return cls(center, np.column_stack((radius, radius)))
+
+    def __len__(self):
+        return len(self.center)
+
+    # Radius of the circle around each center that contains the obstacle
+    def extent(self):
+        return np.where(self.kind == CIRCLE, self.size[:, 0], np.hypot(self.size[:, 0], self.size[:, 1]))
+
+    # For each point k and obstacle index[k]: the unit vector pointing away
+    # from the obstacle's surface and the distance to it (negative inside).
+    # A circle pushes away from its center, as the original scripts did.
+    def surface(self, px, py, index):
+        cx, cy = self.center[index, 0], self.center[index, 1]
+        hw, hh = self.size[index, 0], self.size[index, 1]
+        is_circle = self.kind[index] == CIRCLE
+
+        # Circles
+        dx, dy = px - cx, py - cy
+        d = np.hypot(dx, dy)
+        safe = np.where(d > 0, d, 1.0)
+        ux = np.where(d > 0, dx / safe, 1.0)
+        uy = np.where(d > 0, dy / safe, 0.0)
+        distance = d - hw
+
+        # Rectangles: away from the nearest point, or out through the nearest
+        # edge when inside
+        rect = np.flatnonzero(~is_circle)
+        if len(rect):
+            rx, ry = px[rect], py[rect]
+            left, right = cx[rect] - hw[rect], cx[rect] + hw[rect]
+            bottom, top = cy[rect] - hh[rect], cy[rect] + hh[rect]
+            ex = rx - np.clip(rx, left, right)
+            ey = ry - np.clip(ry, bottom, top)
+            outside = np.hypot(ex, ey)
+            safe = np.where(outside > 0, outside, 1.0)
+
+            edges = np.stack((rx - left, right - rx, ry - bottom, top - ry))
+            nearest = np.argmin(edges, axis=0)
+            normal_x = np.array([-1.0, 1.0, 0.0, 0.0])[nearest]
+            normal_y = np.array([0.0, 0.0, -1.0, 1.0])[nearest]
+            depth = edges[nearest, np.arange(len(rect))]
+
+            ux[rect] = np.where(outside > 0, ex / safe, normal_x)
+            uy[rect] = np.where(outside > 0, ey / safe, normal_y)
+            distance[rect] = np.where(outside > 0, outside, -depth)
+        return ux, uy, distance
+
+    # Summed unit vectors away from every obstacle whose surface is closer
+    # than `clearance` to each point, looked up with the configured method.
+    # With nearest=True also the distance to the nearest of those surfaces
+    # (inf when none is that close, negative inside an obstacle), found in
+    # the same pass.
+    def repulsion(self, px, py, config, nearest=False):
+        if len(self) == 0:
+            empty = (np.zeros(len(px)), np.zeros(len(px)))
+            return empty + (np.full(len(px), np.inf),) if nearest else empty
+        clearance = obstacle_clearance(config)
+        if config.obstacle_lookup == "direct":
+            result = self._direct(px, py, clearance)
+        elif config.obstacle_lookup == "field":
+            key = ("field", clearance, config.field_resolution, config.width, config.height)
+            if key not in self._lookups:
+                self._lookups[key] = ObstacleField(self, clearance, config.width, config.height,
+                                                   config.field_resolution)
+            fx, fy, distance = self._lookups[key].sample(px, py)
+            result = fx, fy, np.where(distance < clearance, distance, np.inf)
+        else:
+            key = ("index", clearance)
+            if key not in self._lookups:
+                self._lookups[key] = ObstacleIndex(self, clearance)
+            result = self._lookups[key].repulsion(px, py)
+        return result if nearest else result[:2]
+
+    # Reference: every point against every obstacle
+    def _direct(self, px, py, clearance):
+        fx = np.zeros(len(px))
+        fy = np.zeros(len(px))
+        nearest = np.full(len(px), np.inf)
+        for i in range(len(self)):
+            ux, uy, distance = self.surface(px, py, np.full(len(px), i))
+            close = distance < clearance
+            fx += np.where(close, ux, 0.0)
+            fy += np.where(close, uy, 0.0)
+            nearest = np.where(close, np.minimum(nearest, distance), nearest)
+        return fx, fy, nearest
+
+
+# Avoidance starts OBSTACLE_AVOIDANCE_DISTANCE - OBSTACLE_SIZE from an
+# obstacle's surface, which for the scripts' equal circles is the original
+# center distance test
+def obstacle_clearance(config):
+    return config.obstacle_avoidance_distance - config.obstacle_size
+
+
+# Static cell list over the obstacle centers. Cells are as large as the
+# biggest obstacle plus the clearance, so only the 3x3 cells around a point
+# can hold obstacles close enough to repel it.
+class ObstacleIndex:
+    def __init__(self, obstacles, clearance):
+        self.obstacles = obstacles
+        self.clearance = clearance
+        cell_size = max(float(obstacles.extent().max()) + clearance, 1.0)
+        center = obstacles.center
+        # The grid covers the obstacles; points outside it fall in the border
+        # cells, which keeps every obstacle in reach in an adjacent cell
+        self.origin = center.min(axis=0) - cell_size
+        span = center.max(axis=0) - self.origin + cell_size
+        self.grid = CellGrid(span[0], span[1], cell_size).rebuild(center[:, 0] - self.origin[0],
+                                                                  center[:, 1] - self.origin[1])
+
+    # Repulsion of each point and its nearest surface within the clearance
+    def repulsion(self, px, py):
+        row, index = self.grid.candidates(px - self.origin[0], py - self.origin[1])
+        ux, uy, distance = self.obstacles.surface(px[row], py[row], index)
+        close = distance < self.clearance
+        fx = np.bincount(row[close], weights=ux[close], minlength=len(px))
+        fy = np.bincount(row[close], weights=uy[close], minlength=len(px))
+        nearest = np.full(len(px), np.inf)
+        np.minimum.at(nearest, row[close], distance[close])
+        return fx, fy, nearest
+
+    # Distance from each point to the nearest obstacle surface within reach
+    # (inf when none is)
+    def nearest_surface(self, px, py):
+        row, index = self.grid.candidates(px - self.origin[0], py - self.origin[1])
+        nearest = np.full(len(px), np.inf)
+        if len(row):
+            _, _, distance = self.obstacles.surface(px[row], py[row], index)
+            np.minimum.at(nearest, row, distance)
+        return nearest
+
+
+# Repulsion and surface distance baked onto a grid with `resolution` pixel
+# spacing and sampled with bilinear interpolation, so a lookup costs the same
+# however many obstacles there are. Sharp edges of the repulsion (where a
+# boid enters the clearance) are smoothed over one grid cell.
+class ObstacleField:
+    def __init__(self, obstacles, clearance, width, height, resolution=2.0):
+        self.resolution = resolution
+        self.nx = int(math.ceil(width / resolution)) + 1
+        self.ny = int(math.ceil(height / resolution)) + 1
+        gy, gx = np.mgrid[0:self.ny, 0:self.nx] * resolution
+        gx, gy = gx.ravel().astype(np.float64), gy.ravel().astype(np.float64)
+
+        index = ObstacleIndex(obstacles, clearance)
+        fx, fy, _ = index.repulsion(gx, gy)
+        # Beyond the clearance only "far" matters; keep the values finite
+        distance = np.minimum(index.nearest_surface(gx, gy), 2 * clearance)
+        self.field = np.stack((fx, fy, distance)).reshape(3, self.ny, self.nx).astype(np.float32)
+
+    # (fx, fy, distance) at each point
+    def sample(self, px, py):
+        gx = np.clip(px / self.resolution, 0, self.nx - 1.000001)
+        gy = np.clip(py / self.resolution, 0, self.ny - 1.000001)
+        ix, iy = gx.astype(np.intp), gy.astype(np.intp)
+        tx, ty = gx - ix, gy - iy
+        f = self.field
+        values = (f[:, iy, ix] * (1 - tx) * (1 - ty) + f[:, iy, ix + 1] * tx * (1 - ty)
+                  + f[:, iy + 1, ix] * (1 - tx) * ty + f[:, iy + 1, ix + 1] * tx * ty)
+        return values[0], values[1], values[2]
+
+
+# Random circles and rectangles of sizes between min_size and max_size (radius
+# or half side) for cluttered environments
+def random_obstacles(config, rng, count, min_size=10, max_size=40, rectangles=0.5):
+    margin = config.obstacle_margin
+    center = np.column_stack((
+        rng.uniform(margin, config.width - margin, size=count),
+        rng.uniform(margin, config.height - margin, size=count),
+    ))
+    kind = np.where(rng.random(count) < rectangles, RECTANGLE, CIRCLE)
+    size = rng.uniform(min_size, max_size, size=(count, 2))
+    size[kind == CIRCLE, 1] = size[kind == CIRCLE, 0]
+    return Obstacles(center, size, kind)
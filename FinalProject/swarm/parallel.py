@@ -0,0 +1,294 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .spatial import CellGrid
+from .state import spawn
+from .step import (accumulate_away, _neighbor_force, avoid_obstacles, change_leaders, limit_speed, move,
+                   seek_formation, update_leaders)
+
+# Arrays kept in shared memory. Positions are double-buffered: followers
+# read every position from one buffer and write their new ones to the other,
+# which gives the single-process step's "everyone sees the same snapshot".
+# Arrays moved over from the state keep its dtypes (float32 and int32 for a
+# compact state).
+SHARED = {
+    "x0": np.float64, "y0": np.float64, "x1": np.float64, "y1": np.float64,
+    "vx": np.float64, "vy": np.float64, "angle": np.float64,
+    "is_leader": np.bool_, "slot": np.int64, "group": np.int64,
+    "order": np.intp, "column_start": np.intp,
+}
+
+
+# What a worker process sees of the swarm: views onto the shared arrays
+_shared = {}
+
+
+def _attach(blocks, config, obstacles):
+    _shared.clear()
+    for name, (block_name, dtype, length) in blocks.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _shared[name] = (block, np.ndarray(length, dtype=dtype, buffer=block.buf))
+    _shared["config"] = config
+    _shared["obstacles"] = obstacles
+
+
+def _array(name):
+    return _shared[name][1]
+
+
+# The part of a swarm one worker needs for a strip: the boids of the strip
+# and its border columns (`near`, first), then any leaders outside them,
+# with the attributes seek_formation, avoid_obstacles and move read.
+# leaders[k] of the whole swarm is local.leaders[k].
+class _Local:
+    def __init__(self, near, leaders, x, y, obstacles):
+        near_is_leader = _array("is_leader")[near]
+        inside = np.flatnonzero(near_is_leader)
+        outside = leaders[~np.isin(leaders, near[inside])]
+        index = np.concatenate((near, outside))
+        # The global leader indices are sorted, so sorting the local
+        # positions by global index lines them up with `leaders`
+        positions = np.concatenate((inside, len(near) + np.arange(len(outside))))
+        self.leaders = positions[np.argsort(index[positions])]
+        self.near_is_leader = near_is_leader
+        self.index = index
+        self.x = x[index]
+        self.y = y[index]
+        self.vx = _array("vx")[index]
+        self.vy = _array("vy")[index]
+        self.angle = _array("angle")[index]
+        self.slot = _array("slot")[index]
+        self.group = _array("group")[index]
+        self.obstacles = obstacles
+
+
+# Step the followers in columns [first, last) of the current buffer `read`
+# and write their new state to the other buffer
+def _step_strip(read, first, last, leaders):
+    config = _shared["config"]
+    x, y = _array(f"x{read}"), _array(f"y{read}")
+    order, column_start = _array("order"), _array("column_start")
+    num_columns = len(column_start) - 1
+
+    # Boids of the strip plus the border columns on either side
+    members = order[column_start[first]:column_start[last]]
+    halo = np.concatenate((order[column_start[max(first - 1, 0)]:column_start[first]],
+                           order[column_start[last]:column_start[min(last + 1, num_columns)]]))
+    near = np.concatenate((members, halo))
+    local = _Local(near, leaders, x, y, _shared["obstacles"])
+    followers = np.flatnonzero(~local.near_is_leader[:len(members)])
+    if len(followers) == 0:
+        return 0
+    owned = members[followers]
+
+    vx, vy = seek_formation(local, config, followers)
+    nx, ny = _avoid_neighbors(local, config, followers, len(near))
+    ox, oy = avoid_obstacles(local, config, followers)
+    vx, vy = limit_speed(vx + nx + ox, vy + ny + oy, config.max_boid_speed)
+    local.vx[followers] = vx
+    local.vy[followers] = vy
+    move(local, config, followers)
+
+    write = 1 - read
+    _array(f"x{write}")[owned] = local.x[followers]
+    _array(f"y{write}")[owned] = local.y[followers]
+    _array("vx")[owned] = vx
+    _array("vy")[owned] = vy
+    _array("angle")[owned] = local.angle[followers]
+    return len(owned)
+
+
+# avoid_neighbors for the followers of one strip against the first
+# `num_near` local boids (strip and border columns), with a grid over just
+# their bounding box
+def _avoid_neighbors(local, config, followers, num_near):
+    radius = config.avoid_distance if config.avoidance_mode == "separate" else config.neighbor_radius
+    fx = np.zeros(len(followers))
+    fy = np.zeros(len(followers))
+    count = np.zeros(len(followers))
+    if radius <= 0:
+        return _neighbor_force(config, fx, fy, count)
+
+    near_x, near_y = local.x[:num_near], local.y[:num_near]
+    left, bottom = near_x.min(), near_y.min()
+    grid = CellGrid(near_x.max() - left + radius, near_y.max() - bottom + radius, radius)
+    grid.rebuild(near_x - left, near_y - bottom)
+    row, col = grid.candidates(local.x[followers] - left, local.y[followers] - bottom)
+    col_is_other = col != followers[row]
+    row, col = row[col_is_other], col[col_is_other]
+    dx = local.x[followers[row]] - local.x[col]
+    dy = local.y[followers[row]] - local.y[col]
+    close = dx * dx + dy * dy < radius * radius
+    accumulate_away(fx, fy, count, row[close], dx[close], dy[close])
+    return _neighbor_force(config, fx, fy, count)
+
+
+# Steps a swarm with its followers split into vertical strips across a pool
+# of worker processes.
+#
+# The swarm's arrays are moved into multiprocessing.shared_memory when the
+# pool starts, so a step only sends each worker its strip's column range and
+# the leader indices. Each step the main process moves the leaders (the
+# broadcast: their new positions are in shared memory before any worker
+# starts) and sorts the boids into columns at least the avoidance radius
+# wide. Strips are runs of whole columns holding about the same number of
+# boids, so they follow the swarm as it clusters. A worker reads only its
+# strip and the one column on each side of it, which holds every neighbor
+# its boids can have, and writes its followers to the other position buffer.
+#
+# Leader selection and wandering stay in the main process, so a run gives
+# the same swarm as step() up to floating point summation order.
+class ParallelSwarm:
+    def __init__(self, state, config, workers=None, strips_per_worker=2):
+        self.state = state
+        self.config = config
+        self.workers = workers or os.cpu_count() or 1
+        self.num_strips = self.workers * strips_per_worker
+        radius = max(config.avoid_distance if config.avoidance_mode == "separate" else config.neighbor_radius, 1.0)
+        self.num_columns = max(1, int(config.width // radius))
+        self.column_width = config.width / self.num_columns
+        self._read = 0
+
+        n = state.num_boids
+        lengths = dict.fromkeys(SHARED, n)
+        lengths["column_start"] = self.num_columns + 1
+        dtypes = dict(SHARED)
+        dtypes.update((name, getattr(state, name).dtype) for name in ("vx", "vy", "angle", "is_leader", "slot", "group"))
+        dtypes.update((name, state.x.dtype) for name in ("x0", "y0", "x1", "y1"))
+        self._blocks = {}
+        self._arrays = {}
+        for name, dtype in dtypes.items():
+            size = max(1, lengths[name] * np.dtype(dtype).itemsize)
+            block = shared_memory.SharedMemory(create=True, size=size)
+            self._blocks[name] = block
+            self._arrays[name] = np.ndarray(lengths[name], dtype=dtype, buffer=block.buf)
+
+        # Move the state into shared memory; the main process keeps using it
+        # through views
+        for name in ("vx", "vy", "angle", "is_leader", "slot", "group"):
+            self._arrays[name][:] = getattr(state, name)
+            setattr(state, name, self._arrays[name])
+        self._arrays["x0"][:] = state.x
+        self._arrays["y0"][:] = state.y
+        state.x, state.y = self._arrays["x0"], self._arrays["y0"]
+
+        blocks = {name: (block.name, dtypes[name], lengths[name]) for name, block in self._blocks.items()}
+        self._pool = ProcessPoolExecutor(self.workers, initializer=_attach,
+                                         initargs=(blocks, config, state.obstacles))
+
+    def _sort_into_columns(self):
+        # The smallest integer type that holds every column: keys of up to
+        # 16 bits are radix sorted, in O(N)
+        column = np.clip(self.state.x // self.column_width, 0, self.num_columns - 1).astype(
+            np.min_scalar_type(self.num_columns - 1))
+        self._arrays["order"][:] = np.argsort(column, kind="stable")
+        column_start = self._arrays["column_start"]
+        column_start[0] = 0
+        np.cumsum(np.bincount(column, minlength=self.num_columns), out=column_start[1:])
+
+    # Column ranges splitting the boids into strips of about equal size
+    def _strips(self):
+        column_start = self._arrays["column_start"]
+        targets = np.arange(1, self.num_strips) * (column_start[-1] / self.num_strips)
+        bounds = np.searchsorted(column_start, targets)
+        bounds = np.unique(np.concatenate(([0], bounds, [self.num_columns])))
+        return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+    def step(self):
+        state = self.state
+        update_leaders(state, self.config)
+        self._sort_into_columns()
+        leaders = state.leaders
+        if len(leaders) and len(state.followers):
+            futures = [self._pool.submit(_step_strip, self._read, first, last, leaders)
+                       for first, last in self._strips()]
+            for future in futures:
+                future.result()
+        else:
+            # Without leaders followers only drift, as in update_followers
+            move(state, self.config, state.followers)
+            self._arrays[f"x{1 - self._read}"][:] = state.x
+            self._arrays[f"y{1 - self._read}"][:] = state.y
+
+        # Leaders are not written by the workers; carry them over and swap
+        write = 1 - self._read
+        self._arrays[f"x{write}"][leaders] = state.x[leaders]
+        self._arrays[f"y{write}"][leaders] = state.y[leaders]
+        self._read = write
+        state.x, state.y = self._arrays[f"x{write}"], self._arrays[f"y{write}"]
+
+        change_leaders(state, self.config)
+        state.frame += 1
+
+    def run(self, steps):
+        for _ in range(steps):
+            self.step()
+        return self.state
+
+    # Stop the workers and give the state private copies of its arrays
+    def close(self):
+        if self._pool is None:
+            return
+        self._pool.shutdown()
+        self._pool = None
+        for name in ("x", "y", "vx", "vy", "angle", "is_leader", "slot", "group"):
+            setattr(self.state, name, getattr(self.state, name).copy())
+        self._arrays.clear()
+        for block in self._blocks.values():
+            block.close()
+            block.unlink()
+        self._blocks.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    from .config import SwarmConfig
+
+    parser = argparse.ArgumentParser(description="Step a large swarm on a pool of worker processes")
+    parser.add_argument("--boids", type=int, default=1000000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[os.cpu_count() or 1],
+                        help="Worker counts to time (0 = single-process step)")
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--boids-per-leader", type=int, default=100)
+    parser.add_argument("--cell-density", type=float, default=0.5,
+                        help="Boids per avoidance-radius square; sets the world size")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from .step import step
+
+    # A world as dense as --cell-density with many small formations
+    side = (args.boids / args.cell_density) ** 0.5 * SwarmConfig.avoid_distance
+    config = SwarmConfig(num_boids=args.boids, width=int(side * 2 ** 0.5), height=int(side / 2 ** 0.5),
+                         num_leaders=max(1, args.boids // args.boids_per_leader),
+                         formation_size=4, num_obstacles=args.boids // 1000)
+    for workers in args.workers:
+        state = spawn(config, args.seed)
+        # One untimed step builds the obstacle index and starts the workers
+        if workers == 0:
+            step(state, config)
+            start = time.perf_counter()
+            for _ in range(args.steps):
+                step(state, config)
+        else:
+            with ParallelSwarm(state, config, workers) as swarm:
+                swarm.step()
+                start = time.perf_counter()
+                swarm.run(args.steps)
+        elapsed = time.perf_counter() - start
+        label = f"{workers} workers" if workers else "single process"
+        print(f"{label}: {args.boids} boids, {elapsed / args.steps * 1000:.1f} ms/step")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+from .config import SwarmConfig
+
+
+# Boid_Rand_Selection.py: wandering leader re-selected at random every
+# LEADER_CHANGE_INTERVAL frames, with obstacles
+def random_selection(**overrides):
+    return SwarmConfig(**overrides)
+
+
+# boid_rand.py: several wandering leaders, no obstacles, no re-selection
+def random_walk(**overrides):
+    params = dict(
+        width=800,
+        height=600,
+        num_boids=200,
+        num_leaders=3,
+        boid_size=8,
+        max_boid_speed=2,
+        leader_speed=2,
+        turn_speed=0.05,
+        formation_distance=5,
+        formation_size=4,
+        formation_radius=80,
+        neighbor_radius=100,
+        avoid_distance=15,
+        num_obstacles=0,
+        obstacle_size=20,
+        obstacle_margin=20,
+        obstacle_avoidance_distance=30,
+        obstacle_avoidance_force=5,
+        kp=0.01,
+        kn=0.5,
+        neighbor_avoidance_force=10,
+        boundary_margin=50,
+        leader_mode="wander",
+        leader_distance_gain=0.02,
+        avoidance_mode="separate",
+        leader_change_interval=0,
+        red_threshold=200,
+    )
+    params.update(overrides)
+    return SwarmConfig(**params)
+
+
+# Boid_mouse.py: leader turning a little every frame, averaged neighbor
+# avoidance within NEIGHBOR_RADIUS
+def mouse(**overrides):
+    params = dict(
+        width=800,
+        height=600,
+        num_boids=200,
+        num_leaders=1,
+        boid_size=8,
+        max_boid_speed=2,
+        leader_speed=4,
+        turn_speed=0.05,
+        formation_size=4,
+        formation_radius=80,
+        neighbor_radius=30,
+        num_obstacles=0,
+        obstacle_size=20,
+        obstacle_margin=0,
+        obstacle_avoidance_distance=30,
+        obstacle_avoidance_force=5,
+        kp=.01,
+        kn=.5,
+        neighbor_avoidance_force=1,
+        boundary_margin=50,
+        clamp_to_screen=False,
+        leader_mode="turn",
+        leader_distance_gain=0,
+        avoidance_mode="average",
+        leader_change_interval=0,
+        red_threshold=200,
+    )
+    params.update(overrides)
+    return SwarmConfig(**params)
+
+
+PRESETS = {
+    "random_selection": random_selection,
+    "random_walk": random_walk,
+    "mouse": mouse,
+}
@@ -0,0 +1,119 @@
+import csv
+import os
+import time
+from collections import deque
+
+# Phases timed by step() and the script main loops, in CSV column order
+PHASES = ("events", "leaders", "formation", "neighbors", "obstacles", "move", "leader_change", "draw", "flip")
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        frame = self.profiler.current
+        frame[self.name] = frame.get(self.name, 0.0) + time.perf_counter() - self.start
+
+
+class _NullPhase:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+# Per-phase wall-clock timers that can be switched on and off at run time.
+#
+# Wrap each phase in `with profiler.phase(name):` and call end_frame() once
+# per frame. While disabled, phase() hands back a shared no-op so the hooks
+# cost one method call. The last `window` frames are kept for the HUD, and
+# with a csv_path every frame is appended to a rolling CSV log that moves to
+# csv_path + ".1" once it holds csv_max_rows rows.
+class Profiler:
+    def __init__(self, enabled=False, window=60, csv_path=None, csv_max_rows=100000):
+        self.enabled = enabled
+        self.history = deque(maxlen=window)
+        self.current = {}
+        self.frame = 0
+        self.csv_path = csv_path
+        self.csv_max_rows = csv_max_rows
+        self._csv_file = None
+        self._csv_writer = None
+        self._csv_rows = 0
+        self._last_frame_end = time.perf_counter()
+
+    def phase(self, name):
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.history.clear()
+        self.current = {}
+
+    def end_frame(self):
+        now = time.perf_counter()
+        frame_time = now - self._last_frame_end
+        self._last_frame_end = now
+        self.frame += 1
+        if not self.enabled:
+            return
+
+        times = self.current
+        times["frame"] = frame_time
+        self.history.append(times)
+        self.current = {}
+        if self.csv_path:
+            self._write_csv(times)
+
+    # Mean milliseconds per frame of every phase over the window
+    def averages(self):
+        if not self.history:
+            return {}
+        totals = {}
+        for times in self.history:
+            for name, seconds in times.items():
+                totals[name] = totals.get(name, 0.0) + seconds
+        return {name: 1000 * seconds / len(self.history) for name, seconds in totals.items()}
+
+    def fps(self):
+        frame_ms = self.averages().get("frame")
+        return 1000 / frame_ms if frame_ms else 0.0
+
+    def _write_csv(self, times):
+        if self._csv_writer is None or self._csv_rows >= self.csv_max_rows:
+            self._open_csv()
+        row = [self.frame, 1000 * times["frame"]] + [1000 * times.get(name, 0.0) for name in PHASES]
+        self._csv_writer.writerow(row)
+        self._csv_rows += 1
+
+    def _open_csv(self):
+        if self._csv_file is not None:
+            self._csv_file.close()
+            os.replace(self.csv_path, self.csv_path + ".1")
+        self._csv_file = open(self.csv_path, "w", newline="")
+        self._csv_writer = csv.writer(self._csv_file)
+        self._csv_writer.writerow(["frame", "frame_ms"] + [f"{name}_ms" for name in PHASES])
+        self._csv_rows = 0
+
+    def close(self):
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = None
+            self._csv_writer = None
+
+
+# Stand-in used by step() when no profiler is passed
+NULL_PROFILER = Profiler(enabled=False)
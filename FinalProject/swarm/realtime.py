@@ -0,0 +1,116 @@
+import threading
+import time
+
+import numpy as np
+
+from .profiling import NULL_PROFILER
+from .state import boid_colors
+from .step import step
+
+# Seconds the physics may fall behind its schedule before the missed steps
+# are dropped instead of being run back to back
+MAX_LAG = 0.25
+
+
+# What the renderer needs of one physics step. It has the attributes
+# BoidRenderer and ObstacleLayer read from a SwarmState, with the colors
+# of a compact state looked up in its palette.
+class Snapshot:
+    def __init__(self, num_boids, obstacles):
+        self.x = np.zeros(num_boids)
+        self.y = np.zeros(num_boids)
+        self.angle = np.zeros(num_boids)
+        self.color = np.zeros((num_boids, 3), dtype=np.uint8)
+        self.is_leader = np.zeros(num_boids, dtype=bool)
+        self.obstacles = obstacles
+        self.frame = 0
+
+    def copy_from(self, source):
+        np.copyto(self.x, source.x)
+        np.copyto(self.y, source.y)
+        np.copyto(self.angle, source.angle)
+        np.copyto(self.color, boid_colors(source))
+        np.copyto(self.is_leader, source.is_leader)
+        self.obstacles = source.obstacles
+        self.frame = source.frame
+
+
+# Two snapshots: the writer fills the back one without holding the lock and
+# then swaps it to the front; readers copy the front one out under the lock.
+# Either side waits at most for one copy of the other.
+class SnapshotBuffer:
+    def __init__(self, state):
+        self._front = Snapshot(state.num_boids, state.obstacles)
+        self._back = Snapshot(state.num_boids, state.obstacles)
+        self._front.copy_from(state)
+        self._lock = threading.Lock()
+
+    def publish(self, state):
+        self._back.copy_from(state)
+        with self._lock:
+            self._front, self._back = self._back, self._front
+
+    # Copy the latest snapshot into `into` (a Snapshot owned by the reader)
+    def read(self, into):
+        with self._lock:
+            into.copy_from(self._front)
+        return into
+
+
+# Runs step() on a background thread at a fixed `rate` in steps per second,
+# independent of how fast frames are drawn, and publishes every step to a
+# SnapshotBuffer. When a step takes longer than its period the worker runs
+# late steps back to back to catch up, up to MAX_LAG seconds behind.
+# `metrics` (a swarm.metrics.FormationMetrics) is updated by every step and
+# can be read from other threads; its summary may be one step behind.
+class SimulationThread:
+    def __init__(self, state, config, rate=60, profiler=NULL_PROFILER, metrics=None):
+        self.state = state
+        self.config = config
+        self.rate = rate
+        self.profiler = profiler
+        self.metrics = metrics
+        self.buffer = SnapshotBuffer(state)
+        self.steps = 0
+        self.dropped = 0  # Steps skipped after falling more than MAX_LAG behind
+        self._snapshot = Snapshot(state.num_boids, state.obstacles)
+        self._stop = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="SimulationThread", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        period = 1.0 / self.rate
+        next_step = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                now = time.perf_counter()
+                if now < next_step:
+                    self._stop.wait(next_step - now)
+                    continue
+                if now - next_step > MAX_LAG:
+                    missed = int((now - next_step) / period)
+                    self.dropped += missed
+                    next_step += missed * period
+                step(self.state, self.config, self.profiler, self.metrics)
+                self.profiler.end_frame()
+                self.buffer.publish(self.state)
+                self.steps += 1
+                next_step += period
+        except Exception as error:
+            self._error = error
+
+    # Latest published state; the returned Snapshot is reused by the next call
+    def latest(self):
+        if self._error is not None:
+            raise self._error
+        return self.buffer.read(self._snapshot)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,335 @@
+import math
+
+import numpy as np
+import pygame
+
+from .obstacles import CIRCLE
+from .profiling import PHASES
+from .state import RED, boid_colors
+
+# Colors
+BLACK = (0, 0, 0)
+WHITE = (255, 255, 255)
+
+# Wing vertices sit this many radians either side of the heading
+WING_ANGLE = 2.5
+# Sprites per Surface.blits call
+BLIT_CHUNK = 1000
+
+# SwarmView: side of the screen tiles whose changes are tracked (rounded up
+# to a multiple that holds a whole sprite), the boid count past which the
+# cheaper level of detail is drawn, and the side of a heatmap cell in pixels
+# (a divisor of TILE_SIZE)
+TILE_SIZE = 32
+LOD_THRESHOLD = 5000
+HEAT_CELL = 8
+# Heatmap colors from empty (black, transparent) to densest (white)
+HEAT_STOPS = [(0.0, BLACK), (0.35, (160, 0, 0)), (0.7, (255, 190, 0)), (1.0, WHITE)]
+
+
+# Tip, left wing and right wing of every boid in one pass: (N, 3, 2)
+def triangle_vertices(x, y, angle, size):
+    corner = angle[:, None] + np.array([0.0, WING_ANGLE, -WING_ANGLE])
+    return np.stack((x[:, None] + size * np.cos(corner), y[:, None] + size * np.sin(corner)), axis=-1)
+
+
+# One polygon per boid (or per boid of `index`), with all the trig done up front
+def draw_polygons(screen, state, size, index=slice(None)):
+    vertices = triangle_vertices(state.x[index], state.y[index], state.angle[index], size).tolist()
+    for points, color in zip(vertices, boid_colors(state, index).tolist()):
+        pygame.draw.polygon(screen, color, points)
+
+
+def draw_obstacles(screen, obstacles, color=WHITE):
+    for (cx, cy), (sx, sy), kind in zip(obstacles.center.tolist(), obstacles.size.tolist(), obstacles.kind.tolist()):
+        if kind == CIRCLE:
+            pygame.draw.circle(screen, color, (int(cx), int(cy)), int(sx))
+        else:
+            pygame.draw.rect(screen, color, pygame.Rect(int(cx - sx), int(cy - sy), int(2 * sx), int(2 * sy)))
+
+
+# Obstacles never move: draw them once onto a transparent layer and blit that
+# every frame. The layer is redrawn when the obstacles or the screen size change.
+class ObstacleLayer:
+    def __init__(self, color=WHITE):
+        self.color = color
+        self.layer = None
+        self.key = None
+
+    def draw(self, screen, obstacles):
+        if len(obstacles) == 0:
+            return
+        key = (id(obstacles), screen.get_size())
+        if key != self.key:
+            self.key = key
+            self.layer = pygame.Surface(screen.get_size())
+            self.layer.set_colorkey((0, 0, 0))
+            draw_obstacles(self.layer, obstacles, self.color)
+        screen.blit(self.layer, (0, 0))
+
+
+# Pre-rendered boid triangles, one per (quantized color, heading bucket).
+# Colors are rounded to COLOR_LEVELS values per channel so the number of
+# sprites stays bounded however many boids there are; sprites are made the
+# first time a key is seen. The pure red level is kept for the leaders: a
+# reddish follower would otherwise round to it, and a dark one to the black
+# of the background, so those are drawn a level lighter instead.
+class SpriteCache:
+    def __init__(self, size, angle_buckets=64, color_levels=4):
+        self.size = size
+        self.angle_buckets = angle_buckets
+        self.color_levels = color_levels
+        self.half = size + 1
+        self.sprites = {}
+
+    # Integer key of every boid's sprite
+    def keys(self, angle, color):
+        bucket = np.rint(angle * (self.angle_buckets / (2 * math.pi))).astype(np.int64) % self.angle_buckets
+        level = (color.astype(np.int64) * self.color_levels) // 256
+        top = self.color_levels - 1
+        leader = (color == RED).all(axis=1)
+        reddish = (level[:, 0] == top) & (level[:, 1] == 0) & (level[:, 2] == 0) & ~leader
+        level[reddish, 1:] = 1
+        level[(level == 0).all(axis=1)] = 1
+        palette = (level[:, 0] * self.color_levels + level[:, 1]) * self.color_levels + level[:, 2]
+        return palette * self.angle_buckets + bucket
+
+    def _render(self, key):
+        palette, bucket = divmod(key, self.angle_buckets)
+        levels = []
+        for _ in range(3):
+            palette, level = divmod(palette, self.color_levels)
+            levels.append(level * 255 // (self.color_levels - 1))
+        color = tuple(reversed(levels))
+
+        angle = 2 * math.pi * bucket / self.angle_buckets
+        center = np.array([self.half, self.half])
+        points = triangle_vertices(center[:1], center[1:], np.array([angle]), self.size)[0]
+
+        sprite = pygame.Surface((2 * self.half + 1, 2 * self.half + 1), pygame.SRCALPHA)
+        pygame.draw.polygon(sprite, color, points.tolist())
+        if pygame.display.get_surface() is not None:
+            sprite = sprite.convert_alpha()
+        return sprite
+
+    def sprites_for(self, keys):
+        for key in np.unique(keys).tolist():
+            if key not in self.sprites:
+                self.sprites[key] = self._render(key)
+        return [self.sprites[key] for key in keys.tolist()]
+
+
+class BoidRenderer:
+    # mode "sprites" blits cached rotated triangles, "polygons" draws exact
+    # triangles with precomputed vertices
+    def __init__(self, boid_size, mode="sprites", angle_buckets=64, color_levels=4):
+        self.boid_size = boid_size
+        self.mode = mode
+        self.cache = SpriteCache(boid_size, angle_buckets, color_levels)
+
+    # Draw every boid, or only the boids of `index`
+    def draw(self, screen, state, index=slice(None)):
+        if self.mode == "polygons":
+            draw_polygons(screen, state, self.boid_size, index)
+            return
+
+        sprites = self.cache.sprites_for(self.cache.keys(state.angle[index], boid_colors(state, index)))
+        left = (state.x[index] - self.cache.half).astype(int).tolist()
+        top = (state.y[index] - self.cache.half).astype(int).tolist()
+        # blits() holds the GIL throughout; blitting in chunks lets a
+        # simulation thread run in between
+        for start in range(0, len(sprites), BLIT_CHUNK):
+            end = start + BLIT_CHUNK
+            screen.blits(zip(sprites[start:end], zip(left[start:end], top[start:end])), doreturn=False)
+
+
+# Color of each heatmap level, (256, 3)
+def heat_palette(stops=HEAT_STOPS):
+    level = np.linspace(0.0, 1.0, 256)
+    at = [stop for stop, _ in stops]
+    channels = [np.interp(level, at, [color[c] for _, color in stops]) for c in range(3)]
+    return np.rint(np.stack(channels, axis=1)).astype(np.uint8)
+
+
+# Draws a swarm and updates only the parts of the window that changed.
+#
+# The background and the obstacles, which never move, are drawn once onto a
+# cached surface. The screen is split into TILE_SIZE tiles; each frame the
+# tiles drawn on in the previous frame are restored from the cache, the
+# boids are drawn, and pygame.display.update gets the previous and current
+# tiles merged into horizontal runs. Boids off the screen are culled.
+#
+# Past `lod_threshold` boids the followers are drawn at a cheaper level of
+# detail `lod`: "points" writes a 2x2 pixel block per boid straight into the
+# screen pixels, "heatmap" colors HEAT_CELL cells by the log of their boid
+# count (a 2-D histogram). Leaders are always drawn as sprites.
+#
+# With dirty_rects=False the whole background is blitted and the display
+# flipped every frame.
+class SwarmView:
+    def __init__(self, boid_size, lod_threshold=LOD_THRESHOLD, lod="points", dirty_rects=True,
+                 background=BLACK, obstacle_color=WHITE, mode="sprites"):
+        if lod not in ("points", "heatmap"):
+            raise ValueError(f"Unknown level of detail {lod!r}; expected 'points' or 'heatmap'")
+        self.boids = BoidRenderer(boid_size, mode)
+        # Sprites reach half + 1 pixels from a boid; tiles hold a whole one
+        self.pad = self.boids.cache.half + 1
+        self.tile = TILE_SIZE * -(-(2 * self.pad) // TILE_SIZE)
+        self.lod_threshold = lod_threshold
+        self.lod = lod
+        self.dirty_rects = dirty_rects
+        self.background_color = background
+        self.obstacle_color = obstacle_color
+        self.palette = heat_palette()
+        self.background = None
+        self.key = None
+        self._previous = None  # Tiles drawn on in the last frame
+        self._current = None
+        self._overlays = []  # Rects drawn over the swarm in the last frame
+        self._full = True
+
+    # Redraw and push the whole window on the next frame
+    def invalidate(self):
+        self._full = True
+
+    def _prepare(self, screen, obstacles):
+        key = (id(obstacles), screen.get_size())
+        if key == self.key:
+            return
+        self.key = key
+        self.background = pygame.Surface(screen.get_size()).convert(screen)
+        self.background.fill(self.background_color)
+        draw_obstacles(self.background, obstacles, self.obstacle_color)
+        self.tiles_x = -(-screen.get_width() // self.tile)
+        self.tiles_y = -(-screen.get_height() // self.tile)
+        self._previous = np.zeros(self.tiles_x * self.tiles_y, dtype=bool)
+        self._full = True
+
+    # Mark the tiles under the boxes [x - pad, x + pad] x [y - pad, y + pad].
+    # A tile is at least 2 * pad wide, so the four corners find every tile.
+    def _mark(self, tiles, x, y, pad):
+        for dx, dy in ((-pad, -pad), (pad, -pad), (-pad, pad), (pad, pad)):
+            tx = np.clip((x + dx) // self.tile, 0, self.tiles_x - 1).astype(np.intp)
+            ty = np.clip((y + dy) // self.tile, 0, self.tiles_y - 1).astype(np.intp)
+            tiles[ty * self.tiles_x + tx] = True
+
+    # Marked tiles as Rects, one per horizontal run of tiles
+    def _rects(self, tiles, size):
+        grid = tiles.reshape(self.tiles_y, self.tiles_x).astype(np.int8)
+        edges = np.diff(np.pad(grid, ((0, 0), (1, 1))), axis=1)
+        rows, starts = np.nonzero(edges == 1)
+        ends = np.nonzero(edges == -1)[1]
+        screen_rect = pygame.Rect((0, 0), size)
+        return [pygame.Rect(start * self.tile, row * self.tile, (end - start) * self.tile, self.tile).clip(screen_rect)
+                for row, start, end in zip(rows.tolist(), starts.tolist(), ends.tolist())]
+
+    # Restore the screen from the cache and draw the swarm
+    def draw(self, screen, state):
+        self._prepare(screen, state.obstacles)
+        width, height = screen.get_size()
+        full = self._full or not self.dirty_rects
+        if full:
+            screen.blit(self.background, (0, 0))
+        else:
+            for rect in self._rects(self._previous, (width, height)) + self._overlays:
+                screen.blit(self.background, rect, rect)
+
+        tiles = np.zeros_like(self._previous)
+        simplified = len(state.x) > self.lod_threshold
+        detailed = state.is_leader if simplified else np.ones(len(state.x), dtype=bool)
+        pad = self.pad
+        visible = ((state.x + pad >= 0) & (state.x - pad < width) &
+                   (state.y + pad >= 0) & (state.y - pad < height))
+        index = np.flatnonzero(visible & detailed)
+        self.boids.draw(screen, state, index)
+        self._mark(tiles, state.x[index], state.y[index], pad)
+
+        if simplified:
+            followers = ~state.is_leader
+            if self.lod == "points":
+                self._draw_points(screen, state, followers, tiles)
+            else:
+                self._draw_heatmap(screen, state, followers, tiles)
+        self._current = tiles
+
+    def _draw_points(self, screen, state, followers, tiles):
+        width, height = screen.get_size()
+        px = np.floor(state.x[followers]).astype(np.intp)
+        py = np.floor(state.y[followers]).astype(np.intp)
+        on_screen = (px >= 0) & (px < width - 1) & (py >= 0) & (py < height - 1)
+        px, py = px[on_screen], py[on_screen]
+        color = boid_colors(state, followers)[on_screen]
+        pixels = pygame.surfarray.pixels3d(screen)
+        for dx, dy in ((0, 0), (1, 0), (0, 1), (1, 1)):
+            pixels[px + dx, py + dy] = color
+        del pixels  # Unlock the screen
+        self._mark(tiles, px, py, 1)
+
+    def _draw_heatmap(self, screen, state, followers, tiles):
+        width, height = screen.get_size()
+        cells_x = -(-width // HEAT_CELL)
+        cells_y = -(-height // HEAT_CELL)
+        cx = np.floor(state.x[followers] / HEAT_CELL).astype(np.intp)
+        cy = np.floor(state.y[followers] / HEAT_CELL).astype(np.intp)
+        on_screen = (cx >= 0) & (cx < cells_x) & (cy >= 0) & (cy < cells_y)
+        counts = np.bincount(cx[on_screen] * cells_y + cy[on_screen], minlength=cells_x * cells_y)
+        if not counts.any():
+            return
+        level = np.log1p(counts) * (255 / np.log1p(counts.max()))
+        colors = self.palette[np.rint(level).astype(np.intp)].reshape(cells_x, cells_y, 3)
+        heat = pygame.transform.scale(pygame.surfarray.make_surface(colors), (cells_x * HEAT_CELL, cells_y * HEAT_CELL))
+        heat.set_colorkey(BLACK)
+
+        # Heat cells line up with the tiles, so only occupied tiles are blitted
+        occupied = np.zeros_like(tiles)
+        cell = np.flatnonzero(counts)
+        self._mark(occupied, (cell // cells_y) * HEAT_CELL, (cell % cells_y) * HEAT_CELL, 0)
+        for rect in self._rects(occupied, (width, height)):
+            screen.blit(heat, rect, rect)
+        tiles |= occupied
+
+    # Push this frame to the display. `overlays` are Rects drawn over the
+    # swarm after draw() (e.g. the HUD); they are restored next frame.
+    def present(self, overlays=()):
+        overlays = [pygame.Rect(rect) for rect in overlays if rect]
+        if self._full or not self.dirty_rects:
+            pygame.display.flip()
+        else:
+            size = pygame.display.get_surface().get_size()
+            pygame.display.update(self._rects(self._previous | self._current, size) + self._overlays + overlays)
+        self._previous = self._current
+        self._overlays = overlays
+        self._full = False
+
+
+# Live overlay of FPS and the mean milliseconds of each profiled phase.
+# With a `physics` profiler (the one a SimulationThread steps with) the HUD
+# also shows the physics rate and the step phases timed on that thread.
+class PerformanceHUD:
+    def __init__(self, profiler, font_size=18, color=WHITE, physics=None):
+        self.profiler = profiler
+        self.physics = physics
+        self.font = pygame.font.Font(None, font_size)
+        self.color = color
+
+    # Returns the Rect drawn on, None when hidden
+    def draw(self, screen, position=(10, 10)):
+        if not self.profiler.enabled:
+            return None
+        averages = self.profiler.averages()
+        lines = [f"FPS {self.profiler.fps():.1f}  frame {averages.get('frame', 0.0):.2f} ms"]
+        if self.physics is not None:
+            physics = self.physics.averages()
+            lines.append(f"Physics {self.physics.fps():.1f} Hz")
+            averages.update((name, ms) for name, ms in physics.items() if name != "frame")
+        for name in PHASES:
+            if name in averages:
+                lines.append(f"{name:<14}{averages[name]:7.2f} ms")
+
+        x, y = position
+        area = pygame.Rect(x, y, 0, 0)
+        for line in lines:
+            text = self.font.render(line, True, self.color)
+            area.union_ip(screen.blit(text, (x, y)))
+            y += text.get_height()
+        return area
@@ -0,0 +1,197 @@
+import argparse
+import os
+import struct
+
+import numpy as np
+
+# Log layout: a 64-byte header followed by float32 records of shape
+# (steps, num_boids, len(FIELDS)), step-major so each step is contiguous
+MAGIC = b"BOIDLOG1"
+HEADER = struct.Struct("<8sIIQQff")  # magic, num_boids, num_fields, capacity, steps, width, height
+HEADER_SIZE = 64
+FIELDS = ("x", "y", "vx", "vy", "angle", "is_leader")
+
+
+def _read_header(path):
+    with open(path, "rb") as f:
+        magic, num_boids, num_fields, capacity, steps, width, height = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a boid trajectory log")
+    return num_boids, num_fields, capacity, steps, width, height
+
+
+# Appends one record per step to a preallocated, memory-mapped float32 file.
+# The file grows by doubling when the preallocated steps run out; close()
+# writes the final step count and trims the unused tail. The header's step
+# count is also rewritten every HEADER_INTERVAL steps, so a run that dies
+# without closing the log loses at most that many steps.
+class TrajectoryWriter:
+    def __init__(self, path, num_boids, width, height, capacity=1024, header_interval=64):
+        self.path = path
+        self.num_boids = num_boids
+        self.width = width
+        self.height = height
+        self.header_interval = header_interval
+        self.steps = 0
+        self._capacity = 0
+        self._records = None
+        self._resize(max(1, capacity))
+
+    def _resize(self, capacity):
+        if self._records is not None:
+            self._records.flush()
+            del self._records
+        size = HEADER_SIZE + capacity * self.num_boids * len(FIELDS) * 4
+        mode = "r+b" if self._capacity else "w+b"
+        with open(self.path, mode) as f:
+            f.truncate(size)
+        self._capacity = capacity
+        self._write_header()
+        self._records = np.memmap(self.path, dtype=np.float32, mode="r+", offset=HEADER_SIZE,
+                                  shape=(capacity, self.num_boids, len(FIELDS)))
+
+    def _write_header(self):
+        with open(self.path, "r+b") as f:
+            f.write(HEADER.pack(MAGIC, self.num_boids, len(FIELDS), self._capacity, self.steps,
+                                self.width, self.height))
+
+    def append(self, state):
+        if self.steps == self._capacity:
+            self._resize(2 * self._capacity)
+        record = self._records[self.steps]
+        record[:, 0] = state.x
+        record[:, 1] = state.y
+        record[:, 2] = state.vx
+        record[:, 3] = state.vy
+        record[:, 4] = state.angle
+        record[:, 5] = state.is_leader
+        self.steps += 1
+        if self.steps % self.header_interval == 0:
+            self._write_header()
+
+    def close(self):
+        if self._records is None:
+            return
+        self._records.flush()
+        del self._records
+        self._records = None
+        with open(self.path, "r+b") as f:
+            f.truncate(HEADER_SIZE + self.steps * self.num_boids * len(FIELDS) * 4)
+        self._capacity = self.steps
+        self._write_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Read-only memory-mapped view of a log; steps are loaded from disk on access
+class TrajectoryReader:
+    def __init__(self, path):
+        self.path = path
+        self.num_boids, num_fields, capacity, steps, self.width, self.height = _read_header(path)
+        # A writer that was never closed leaves the count it last wrote
+        self.steps = steps
+        if steps == 0:
+            # A log closed before its first step has no records to map
+            self.records = np.empty((0, self.num_boids, num_fields), dtype=np.float32)
+        else:
+            self.records = np.memmap(path, dtype=np.float32, mode="r", offset=HEADER_SIZE,
+                                     shape=(capacity, self.num_boids, num_fields))[:steps]
+
+    def __len__(self):
+        return self.steps
+
+    # Columns of one field over all steps, e.g. reader.field("x")[:, 0]
+    def field(self, name):
+        return self.records[:, :, FIELDS.index(name)]
+
+    def frame(self, index):
+        record = self.records[index]
+        return ReplayFrame(
+            x=record[:, 0],
+            y=record[:, 1],
+            angle=record[:, 4],
+            is_leader=record[:, 5] > 0.5,
+        )
+
+
+class ReplayFrame:
+    def __init__(self, x, y, angle, is_leader):
+        self.x = x
+        self.y = y
+        self.angle = angle
+        self.is_leader = is_leader
+        self.color = None
+
+
+# Step through a log in a window at `speed` logged steps per displayed frame.
+# Space pauses, Up/Down double or halve the speed, Left/Right step back and
+# forward, Escape quits.
+def replay(path, speed=1.0, fps=60, boid_size=8):
+    import pygame
+
+    from .render import BoidRenderer
+    from .state import RED, random_non_red_colors
+
+    reader = TrajectoryReader(path)
+    pygame.init()
+    screen = pygame.display.set_mode((int(reader.width), int(reader.height)))
+    pygame.display.set_caption(f"Replay {os.path.basename(path)}")
+    renderer = BoidRenderer(boid_size)
+    clock = pygame.time.Clock()
+
+    # The log has no colors; give each boid a fixed one
+    colors = random_non_red_colors(np.random.default_rng(0), reader.num_boids, 200)
+
+    position = 0.0
+    paused = False
+    running = True
+    while running and reader.steps:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+                elif event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_UP:
+                    speed *= 2
+                elif event.key == pygame.K_DOWN:
+                    speed /= 2
+                elif event.key == pygame.K_RIGHT:
+                    position += 1
+                elif event.key == pygame.K_LEFT:
+                    position -= 1
+
+        position = min(max(position, 0.0), reader.steps - 1)
+        frame = reader.frame(int(position))
+        frame.color = colors.copy()
+        frame.color[frame.is_leader] = RED
+
+        screen.fill((0, 0, 0))
+        renderer.draw(screen, frame)
+        pygame.display.flip()
+
+        if not paused:
+            position += speed
+        clock.tick(fps)
+
+    pygame.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a boid trajectory log")
+    parser.add_argument("path")
+    parser.add_argument("--speed", type=float, default=1.0, help="Logged steps per displayed frame")
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--boid-size", type=int, default=8)
+    args = parser.parse_args()
+    replay(args.path, args.speed, args.fps, args.boid_size)
+
+
+if __name__ == "__main__":
+    main()
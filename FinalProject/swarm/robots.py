@@ -0,0 +1,119 @@
+import argparse
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+
+# Path of the leader in Project/Project.ipynb
+def desired_path(t):
+    return np.sin(t / 10), np.sin(t / 20)
+
+
+# Poses and inputs of every follower at each output time
+@dataclass
+class RobotTrajectory:
+    t: np.ndarray  # (T,)
+    x: np.ndarray  # (T, N)
+    y: np.ndarray
+    theta: np.ndarray
+    v: np.ndarray
+    omega: np.ndarray
+    leader_x: np.ndarray  # (T,)
+    leader_y: np.ndarray
+    steps: int  # Integration steps taken
+
+
+# Inputs of the Project controller: drive towards the leader at a speed
+# proportional to the distance and turn towards it at a rate proportional
+# to the heading error. The error is wrapped to [-pi, pi) so a robot turns
+# the short way; unwrapped, the jump of arctan2 when the leader passes
+# behind a robot sends it on a full turn away from the leader.
+def follower_controls(x, y, theta, leader_x, leader_y, gain):
+    e_x = leader_x - x
+    e_y = leader_y - y
+    e_theta = (np.arctan2(e_y, e_x) - theta + np.pi) % (2 * np.pi) - np.pi
+    return gain * np.hypot(e_x, e_y), gain * e_theta
+
+
+# Advance all followers of the Project controller together and record them
+# at each of the output `times`.
+#
+# Between two output times the team is integrated with steps of at most
+# `dt` (the heading first, then the position along the new heading, as
+# update_pose did, but scaled by the step instead of the absolute time).
+# With max_turn set the steps are adaptive: each is shortened so that no
+# robot turns by more than max_turn radians, and dt is only the upper bound.
+# `path(t)` gives the leader's position; the leader follows it exactly.
+def simulate(x0, y0, theta0, times, dt=0.01, gain=0.001, path=desired_path, max_turn=None):
+    x = np.array(x0, dtype=np.float64)
+    y = np.array(y0, dtype=np.float64)
+    theta = np.array(theta0, dtype=np.float64)
+    times = np.asarray(times, dtype=np.float64)
+    n, rows = len(x), len(times)
+
+    trajectory = RobotTrajectory(
+        t=times.copy(),
+        x=np.empty((rows, n)),
+        y=np.empty((rows, n)),
+        theta=np.empty((rows, n)),
+        v=np.empty((rows, n)),
+        omega=np.empty((rows, n)),
+        leader_x=np.empty(rows),
+        leader_y=np.empty(rows),
+        steps=0,
+    )
+
+    t = times[0] if rows else 0.0
+    for row, t_out in enumerate(times):
+        # Stop short of t_out by rounding error rather than taking a
+        # vanishing extra step
+        while t_out - t > 1e-9 * dt:
+            h = min(dt, t_out - t)
+            lx, ly = path(t)
+            v, omega = follower_controls(x, y, theta, lx, ly, gain)
+            if max_turn is not None:
+                fastest = np.abs(omega).max() if n else 0.0
+                if fastest * h > max_turn:
+                    h = max_turn / fastest
+            theta += omega * h
+            x += v * np.cos(theta) * h
+            y += v * np.sin(theta) * h
+            t += h
+            trajectory.steps += 1
+        t = max(t, t_out)
+
+        lx, ly = path(t_out)
+        trajectory.x[row] = x
+        trajectory.y[row] = y
+        trajectory.theta[row] = theta
+        trajectory.v[row], trajectory.omega[row] = follower_controls(x, y, theta, lx, ly, gain)
+        trajectory.leader_x[row], trajectory.leader_y[row] = lx, ly
+    return trajectory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Integrate many followers of the Project leader-follower controller")
+    parser.add_argument("--followers", type=int, default=500)
+    parser.add_argument("--t-end", type=float, default=124.0)
+    parser.add_argument("--dt", type=float, default=0.01)
+    parser.add_argument("--output-dt", type=float, default=0.1, help="Spacing of the recorded times")
+    parser.add_argument("--gain", type=float, default=0.001)
+    parser.add_argument("--max-turn", type=float, default=None, help="Adaptive steps: largest turn per step (rad)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    n = args.followers
+    times = np.arange(0.0, args.t_end + args.output_dt / 2, args.output_dt)
+    start = time.perf_counter()
+    trajectory = simulate(rng.uniform(-2, 2, n), rng.uniform(-2, 2, n), rng.uniform(-np.pi, np.pi, n), times,
+                          args.dt, args.gain, max_turn=args.max_turn)
+    elapsed = time.perf_counter() - start
+    gap = np.hypot(trajectory.x[-1] - trajectory.leader_x[-1], trajectory.y[-1] - trajectory.leader_y[-1])
+    print(f"{n} followers, {trajectory.steps} steps to t = {times[-1]:g} in {elapsed:.2f} s; "
+          f"mean final distance to the leader {gap.mean():.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import math
+
+import numpy as np
+
+# Offsets of a cell and its eight neighbors
+NEIGHBOR_CELLS = [(dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1)]
+
+
+# Uniform-grid spatial hash (cell list). Boids are sorted by cell so that the
+# members of cell c are order[cell_start[c]:cell_start[c + 1]]. With a cell
+# size of at least the query radius every neighbor lies in the 3x3 block of
+# cells around a boid, so a query costs O(neighbors) instead of O(N).
+#
+# With periodic=True the grid tiles a torus of width x height: cells are
+# stretched to divide the box evenly (never below cell_size) and the cells
+# past an edge wrap around to the opposite one.
+class CellGrid:
+    def __init__(self, width, height, cell_size, periodic=False):
+        self.cell_size = cell_size
+        self.periodic = periodic
+        if periodic:
+            self.nx = max(1, math.floor(width / cell_size))
+            self.ny = max(1, math.floor(height / cell_size))
+            self.cell_w, self.cell_h = width / self.nx, height / self.ny
+        else:
+            self.nx = max(1, math.ceil(width / cell_size))
+            self.ny = max(1, math.ceil(height / cell_size))
+            self.cell_w = self.cell_h = cell_size
+        self.order = np.empty(0, dtype=np.intp)
+        self.cell_start = np.zeros(self.nx * self.ny + 1, dtype=np.intp)
+
+    # Cell coordinates of each point. Points off the grid are put in the
+    # nearest border cell, which keeps neighbors in adjacent cells, or
+    # wrapped into the box when the grid is periodic.
+    def cell_of(self, x, y):
+        cx = (x // self.cell_w).astype(np.intp)
+        cy = (y // self.cell_h).astype(np.intp)
+        if self.periodic:
+            return cx % self.nx, cy % self.ny
+        return np.clip(cx, 0, self.nx - 1), np.clip(cy, 0, self.ny - 1)
+
+    # Neighbor cell offsets; on a periodic grid narrower than three cells
+    # the wrapped offsets coincide and are only visited once
+    def _offsets(self):
+        if not self.periodic:
+            return NEIGHBOR_CELLS
+        xs = sorted({o % self.nx for o in (-1, 0, 1)})
+        ys = sorted({o % self.ny for o in (-1, 0, 1)})
+        return [(dx, dy) for dy in ys for dx in xs]
+
+    # Rebuild the index from scratch by sorting the boids by cell
+    def rebuild(self, x, y):
+        cx, cy = self.cell_of(x, y)
+        cell = cy * self.nx + cx
+        self.order = np.argsort(cell, kind="stable")
+        counts = np.bincount(cell, minlength=self.nx * self.ny)
+        self.cell_start[0] = 0
+        np.cumsum(counts, out=self.cell_start[1:])
+        return self
+
+    # Candidate pairs (query row, boid index) for every boid sharing or
+    # touching the cell of each query point. Rows index into qx/qy.
+    def candidates(self, qx, qy):
+        cx, cy = self.cell_of(qx, qy)
+        rows = []
+        cols = []
+        for ox, oy in self._offsets():
+            nx, ny = cx + ox, cy + oy
+            if self.periodic:
+                nx, ny = nx % self.nx, ny % self.ny
+            valid = np.flatnonzero((nx >= 0) & (nx < self.nx) & (ny >= 0) & (ny < self.ny))
+            cell = ny[valid] * self.nx + nx[valid]
+            start = self.cell_start[cell]
+            counts = self.cell_start[cell + 1] - start
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            # Expand each [start, start + count) range into member positions
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            rows.append(np.repeat(valid, counts))
+            cols.append(self.order[np.repeat(start, counts) + offsets])
+        if not rows:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+        return np.concatenate(rows), np.concatenate(cols)
+
+
+def build_grid(state, config, cell_size):
+    return CellGrid(config.width, config.height, cell_size).rebuild(state.x, state.y)
@@ -0,0 +1,218 @@
+import argparse
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as sla
+
+# Graphs up to this many nodes are solved densely; the sparse solvers only
+# pay off (and only work for k < n - 1) on larger ones
+DENSE_LIMIT = 256
+# Spectra kept in memory, least recently used dropped first
+CACHE_SIZE = 4096
+# Eigenvalues closer to 0 than this count as zero
+ZERO_TOL = 1e-9
+# Shift of the sparse shift-invert solves. L - SHIFT * I is nonsingular for
+# any Laplacian, and a shift close to 0 keeps the small eigenvalues (which
+# crowd together on large sparse graphs) well separated after inversion.
+SHIFT = -1e-3
+
+_cache = OrderedDict()
+
+
+@dataclass
+class Spectrum:
+    key: str  # Canonical edge-list hash of the graph
+    num_nodes: int
+    directed: bool
+    smallest: np.ndarray  # The k eigenvalues of L with the smallest real part, ascending
+    # Real part of the second smallest eigenvalue: the algebraic connectivity
+    # of an undirected graph and, for x' = -Lx, the exponential rate at which
+    # the agents approach consensus. 0 when they never do.
+    algebraic_connectivity: float
+
+    @property
+    def consensus_rate(self):
+        return self.algebraic_connectivity
+
+    # Undirected: connected. Directed: has a spanning tree, the condition
+    # for consensus.
+    @property
+    def connected(self):
+        return self.algebraic_connectivity > ZERO_TOL
+
+
+# (num_nodes, edges (m, 2) of node indices, directed) of a networkx graph.
+# Nodes are numbered in graph order, as nx.adjacency_matrix does.
+def graph_edges(graph):
+    index = {node: i for i, node in enumerate(graph.nodes())}
+    edges = np.array([(index[u], index[v]) for u, v in graph.edges()], dtype=np.int64).reshape(-1, 2)
+    return len(index), edges, graph.is_directed()
+
+
+# Sorted, duplicate-free edges without self loops (which cancel in L). An
+# undirected edge is stored once as (low, high).
+# The edges are sorted as single int64 codes source * num_nodes + target.
+def canonical_edges(num_nodes, edges, directed):
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    if not directed:
+        edges = np.sort(edges, axis=1)
+    codes = np.unique(edges[:, 0] * num_nodes + edges[:, 1])
+    return np.column_stack(np.divmod(codes, num_nodes))
+
+
+def edge_hash(num_nodes, edges, directed):
+    digest = hashlib.sha256()
+    digest.update(np.array([num_nodes, directed], dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(canonical_edges(num_nodes, edges, directed)).tobytes())
+    return digest.hexdigest()
+
+
+# Sparse Laplacian L = D - A with D the out-degrees (row sums of A), the
+# matrix the notebooks build from nx.adjacency_matrix by hand
+def laplacian(num_nodes, edges, directed):
+    edges = canonical_edges(num_nodes, edges, directed)
+    if not directed:
+        edges = np.concatenate((edges, edges[:, ::-1]))
+    a = sp.csr_matrix((np.ones(len(edges)), (edges[:, 0], edges[:, 1])), shape=(num_nodes, num_nodes))
+    return (sp.diags(np.asarray(a.sum(axis=1)).ravel()) - a).tocsc()
+
+
+def _smallest_eigenvalues(l, k, directed):
+    n = l.shape[0]
+    if n <= max(DENSE_LIMIT, k + 2):
+        values = np.linalg.eigvalsh(l.toarray()) if not directed else np.linalg.eigvals(l.toarray())
+    elif not directed:
+        # L is positive semidefinite, so the eigenvalues nearest SHIFT are
+        # the smallest ones
+        values = sla.eigsh(l, k=k, sigma=SHIFT, which="LM", return_eigenvectors=False)
+    else:
+        values = _smallest_real_part(l, k)
+    values = values[np.lexsort((values.imag, values.real))] if np.iscomplexobj(values) else np.sort(values)
+    return values[:k]
+
+
+# Eigenvalues of a directed L including the k with the smallest real parts.
+# The ones nearest SHIFT are not always those: a complex pair can lie
+# farther out than a real eigenvalue yet have a smaller real part. Every
+# eigenvalue lies in a Gershgorin disc |lambda - d| <= d with d at most the
+# largest degree, so Re(lambda) >= |lambda|^2 / (2 * d), and the nearest
+# eigenvalues are taken in growing batches until none beyond them can have
+# a smaller k-th real part. High degrees leave that bound loose; then the
+# eigenvalues ARPACK finds with the smallest real parts directly are used
+# instead if their k-th real part is smaller.
+def _smallest_real_part(l, k):
+    n = l.shape[0]
+    degree = l.diagonal().max()
+    best = None
+    # Factored once for all batches
+    shifted = sla.splu((l - SHIFT * sp.identity(n, format="csc")).tocsc())
+    inverse = sla.LinearOperator((n, n), matvec=shifted.solve, dtype=np.float64)
+    for m in (2 * k + 8, 8 * k + 32):
+        if m >= n - 1:
+            break
+        values = sla.eigs(l, k=m, sigma=SHIFT, which="LM", OPinv=inverse, return_eigenvectors=False)
+        kth = np.sort(values.real)[k - 1]
+        # Every eigenvalue not found is at least this far from 0
+        reach = np.abs(values - SHIFT).max() - abs(SHIFT)
+        if degree <= 0 or kth <= reach ** 2 / (2 * degree):
+            return values
+        best = values
+    if best is None:
+        return np.linalg.eigvals(l.toarray())
+    try:
+        direct = sla.eigs(l, k=k, which="SR", return_eigenvectors=False)
+    except sla.ArpackNoConvergence as error:
+        direct = error.eigenvalues
+    if len(direct) == k and np.sort(direct.real)[k - 1] < np.sort(best.real)[k - 1]:
+        return direct
+    return best
+
+
+def _spectrum(key, num_nodes, edges, directed, k):
+    smallest = _smallest_eigenvalues(laplacian(num_nodes, edges, directed), k, directed)
+    if np.iscomplexobj(smallest) and np.all(np.abs(smallest.imag) < ZERO_TOL):
+        smallest = smallest.real
+    connectivity = float(smallest[1].real) if len(smallest) > 1 else 0.0
+    return Spectrum(key=key, num_nodes=num_nodes, directed=directed, smallest=smallest,
+                    algebraic_connectivity=connectivity if connectivity > ZERO_TOL else 0.0)
+
+
+# Spectrum of a networkx graph or of a (num_nodes, edges, directed) tuple.
+# Results are memoized by the canonical edge-list hash, so a topology that
+# was analyzed before (in any node insertion or edge order) costs one hash.
+def analyze(graph, k=3):
+    num_nodes, edges, directed = graph if isinstance(graph, tuple) else graph_edges(graph)
+    k = min(k, num_nodes)
+    key = edge_hash(num_nodes, edges, directed)
+    entry = (key, k)
+    if entry in _cache:
+        _cache.move_to_end(entry)
+        return _cache[entry]
+    spectrum = _spectrum(key, num_nodes, edges, directed, k)
+    _cache[entry] = spectrum
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return spectrum
+
+
+# Spectra of many graphs; repeated topologies in the batch are solved once
+def analyze_batch(graphs, k=3):
+    return [analyze(graph, k) for graph in graphs]
+
+
+def clear_cache():
+    _cache.clear()
+
+
+# Largest difference between the real parts of the k smallest eigenvalues
+# analyze() finds for a directed graph just above DENSE_LIMIT and those of
+# the dense solver. The graph is a directed cycle, whose first complex pair
+# has a smaller real part than the second eigenvalue of a separate path but
+# lies farther from 0.
+def check_directed(k=3):
+    n = DENSE_LIMIT + 1
+    ring = np.arange(n - 32)
+    path = np.arange(n - 32, n - 1)
+    edges = np.concatenate((np.column_stack((ring, np.roll(ring, -1))), np.column_stack((path, path + 1)),
+                            np.column_stack((path + 1, path))))
+    found = analyze((n, edges, True), k).smallest
+    dense = np.linalg.eigvals(laplacian(n, edges, True).toarray())
+    return float(np.abs(np.sort(found.real) - np.sort(dense.real)[:k]).max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Algebraic connectivity of random communication graphs")
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--radius", type=float, default=0.02,
+                        help="Connection radius of random geometric graphs in the unit square")
+    parser.add_argument("--graphs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from .spatial import CellGrid
+
+    rng = np.random.default_rng(args.seed)
+    graphs = []
+    for _ in range(args.graphs):
+        x, y = rng.random(args.nodes), rng.random(args.nodes)
+        rows, cols = CellGrid(1.0, 1.0, args.radius).rebuild(x, y).candidates(x, y)
+        close = (rows < cols) & (np.hypot(x[rows] - x[cols], y[rows] - y[cols]) < args.radius)
+        graphs.append((args.nodes, np.column_stack((rows[close], cols[close])), False))
+
+    for label, batch in (("first pass", graphs), ("cached", graphs)):
+        start = time.perf_counter()
+        spectra = analyze_batch(batch)
+        elapsed = time.perf_counter() - start
+        print(f"{label}: {len(batch)} graphs of {args.nodes} nodes in {elapsed:.3f} s")
+    for spectrum in spectra:
+        print(f"  {spectrum.key[:12]}  lambda2 {spectrum.algebraic_connectivity:.3e}  connected {spectrum.connected}")
+    print(f"directed graph of {DENSE_LIMIT + 1} nodes: max difference to the dense eigenvalues {check_directed():.2e}")
+
+
+if __name__ == "__main__":
+    main()
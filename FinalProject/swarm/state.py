@@ -0,0 +1,279 @@
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from .obstacles import Obstacles
+
+# Colors
+RED = (255, 0, 0)
+
+# Colors in a compact state's palette; entry 0 is the leaders' red
+PALETTE_SIZE = 256
+
+
+# Struct-of-arrays swarm state: entry i of every array belongs to boid i
+@dataclass
+class SwarmState:
+    x: np.ndarray
+    y: np.ndarray
+    vx: np.ndarray
+    vy: np.ndarray
+    angle: np.ndarray
+    is_leader: np.ndarray
+    color: np.ndarray  # (N, 3) uint8, or (N,) uint8 indices into palette
+    wander_timer: np.ndarray  # Per-boid timer to periodically change direction
+    obstacles: Obstacles
+    rng: np.random.Generator
+    # Leader registry, kept in sync with is_leader by set_leaders()
+    leaders: np.ndarray  # Sorted indices of the leaders
+    followers: np.ndarray  # Sorted indices of everyone else
+    # Stable formation assignment: follower i takes slot slot[i] around
+    # leaders[group[i] % len(leaders)]
+    slot: np.ndarray
+    group: np.ndarray
+    frame: int = 0
+    leader_change_timer: int = 0
+    palette: np.ndarray = None  # (PALETTE_SIZE, 3) uint8 of a compact state
+    config: object = None  # The SwarmConfig spawn() made the state for
+
+    @property
+    def num_boids(self):
+        return len(self.x)
+
+    def __len__(self):
+        return len(self.x)
+
+    # Boid view of boid i, or of every boid when iterated
+    def __getitem__(self, i):
+        if not -len(self.x) <= i < len(self.x):
+            raise IndexError(i)
+        return Boid(self, i % len(self.x))
+
+    def __iter__(self):
+        return (Boid(self, i) for i in range(len(self.x)))
+
+
+# One boid of a SwarmState with the attributes of the Boid class the scripts
+# used to have. It holds only the state and an index, so views are cheap to
+# make; reads and writes go straight to the arrays. Making a boid a leader
+# or a follower updates the leader registry and, like a leader change,
+# recolors the boid and (with optimal slots in the state's config) assigns
+# the formation slots again. Two views of the same boid compare and hash
+# equal, so `other != self` and list.index() work as they did on Boid
+# objects.
+class Boid:
+    __slots__ = ("state", "index")
+
+    def __init__(self, state, index):
+        self.state = state
+        self.index = index
+
+    def __repr__(self):
+        return f"Boid({self.index}, x={self.x:.1f}, y={self.y:.1f}, leader={self.is_leader})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Boid):
+            return NotImplemented
+        return self.state is other.state and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.state), self.index))
+
+    @property
+    def x(self):
+        return float(self.state.x[self.index])
+
+    @x.setter
+    def x(self, value):
+        self.state.x[self.index] = value
+
+    @property
+    def y(self):
+        return float(self.state.y[self.index])
+
+    @y.setter
+    def y(self, value):
+        self.state.y[self.index] = value
+
+    @property
+    def vx(self):
+        return float(self.state.vx[self.index])
+
+    @vx.setter
+    def vx(self, value):
+        self.state.vx[self.index] = value
+
+    @property
+    def vy(self):
+        return float(self.state.vy[self.index])
+
+    @vy.setter
+    def vy(self, value):
+        self.state.vy[self.index] = value
+
+    @property
+    def angle(self):
+        return float(self.state.angle[self.index])
+
+    @angle.setter
+    def angle(self, value):
+        self.state.angle[self.index] = value
+
+    @property
+    def change_direction_timer(self):
+        return int(self.state.wander_timer[self.index])
+
+    @change_direction_timer.setter
+    def change_direction_timer(self, value):
+        self.state.wander_timer[self.index] = value
+
+    @property
+    def is_leader(self):
+        return bool(self.state.is_leader[self.index])
+
+    @is_leader.setter
+    def is_leader(self, value):
+        state, config = self.state, self.state.config
+        if bool(value) == self.is_leader:
+            return
+        leaders = state.leaders
+        if value:
+            set_leaders(state, np.append(leaders, self.index))
+            state.color[self.index] = leader_color(state.palette)
+        else:
+            set_leaders(state, leaders[leaders != self.index])
+            state.color[self.index] = follower_colors(state.rng, 1, config, state.palette)[0]
+        if config.slot_assignment == "optimal":
+            from .assignment import reassign_slots
+            reassign_slots(state, config, leaders)
+
+    @property
+    def color(self):
+        return tuple(boid_colors(self.state, self.index).tolist())
+
+    # An RGB color; a compact state stores the nearest palette entry
+    @color.setter
+    def color(self, value):
+        palette = self.state.palette
+        if palette is None:
+            self.state.color[self.index] = value
+        else:
+            difference = palette.astype(np.int64) - np.asarray(value, dtype=np.int64)
+            self.state.color[self.index] = np.argmin((difference * difference).sum(axis=1))
+
+
+# RGB colors (N, 3) of the boids of `index`, from the palette of a compact
+# state or straight from the color array
+def boid_colors(state, index=slice(None)):
+    palette = getattr(state, "palette", None)
+    return state.color[index] if palette is None else palette[state.color[index]]
+
+
+# Colors for n boids turning into followers and the color of leaders, as
+# RGB or as palette indices for a compact state
+def follower_colors(rng, n, config, palette=None):
+    if palette is None:
+        return random_non_red_colors(rng, n, config.red_threshold)
+    return rng.integers(1, len(palette), size=n).astype(np.uint8)
+
+
+def leader_color(palette=None):
+    return RED if palette is None else 0
+
+
+# Formation assignment by boid index. Slots cycle fastest so that each block
+# of FORMATION_SIZE consecutive boids fills one formation, and blocks are
+# dealt out to the leaders in turn. With one leader this is the
+# index % FORMATION_SIZE slot of the original scripts.
+def formation_slots(n, config):
+    index = np.arange(n)
+    return index % config.formation_size, index // config.formation_size
+
+
+# Make exactly the given boids leaders and refresh the registry
+def set_leaders(state, leaders):
+    leaders = np.unique(leaders)
+    state.is_leader[:] = False
+    state.is_leader[leaders] = True
+    state.leaders = leaders
+    state.followers = np.flatnonzero(~state.is_leader)
+
+
+# Generate n random colors that aren't red
+def random_non_red_colors(rng, n, red_threshold):
+    colors = np.empty((n, 3), dtype=np.uint8)
+    filled = 0
+    while filled < n:
+        candidates = rng.integers(0, 256, size=(n - filled, 3))
+        r, g, b = candidates.T
+        # Check that the color isn't too close to red
+        keep = candidates[~((r > red_threshold) & (g < 100) & (b < 100))]
+        colors[filled:filled + len(keep)] = keep
+        filled += len(keep)
+    return colors
+
+
+def spawn_obstacles(config, rng):
+    margin = config.obstacle_margin
+    ox = rng.integers(margin, config.width - margin, size=config.num_obstacles, endpoint=True)
+    oy = rng.integers(margin, config.height - margin, size=config.num_obstacles, endpoint=True)
+    return Obstacles.circles(np.column_stack((ox, oy)), config.obstacle_size)
+
+
+# Create boids with leaders (the first NUM_LEADERS boids) and obstacles at
+# random positions, the same way the scripts build their Boid lists
+def spawn(config, seed=None):
+    rng = np.random.default_rng(seed)
+    n = config.num_boids
+
+    x = rng.integers(0, config.width, size=n, endpoint=True).astype(np.float64)
+    y = rng.integers(0, config.height, size=n, endpoint=True).astype(np.float64)
+    angle = rng.uniform(0, math.pi * 2, size=n)
+    is_leader = np.arange(n) < config.num_leaders
+    vx = np.zeros(n)
+    vy = np.zeros(n)
+
+    num_leaders = int(is_leader.sum())
+    if config.leader_mode == "wander":
+        vx[is_leader] = rng.uniform(-config.leader_speed, config.leader_speed, size=num_leaders)
+        vy[is_leader] = rng.uniform(-config.leader_speed, config.leader_speed, size=num_leaders)
+    else:
+        vx[is_leader] = config.leader_speed * np.cos(angle[is_leader])
+        vy[is_leader] = config.leader_speed * np.sin(angle[is_leader])
+
+    if config.compact_state:
+        palette = np.empty((PALETTE_SIZE, 3), dtype=np.uint8)
+        palette[0] = RED
+        palette[1:] = random_non_red_colors(rng, PALETTE_SIZE - 1, config.red_threshold)
+    else:
+        palette = None
+    color = follower_colors(rng, n, config, palette)
+    color[is_leader] = leader_color(palette)
+    slot, group = formation_slots(n, config)
+
+    if config.compact_state:
+        x, y, vx, vy, angle = (a.astype(np.float32) for a in (x, y, vx, vy, angle))
+        slot, group = slot.astype(np.int32), group.astype(np.int32)
+    state = SwarmState(
+        x=x,
+        y=y,
+        vx=vx,
+        vy=vy,
+        angle=angle,
+        is_leader=is_leader,
+        color=color,
+        wander_timer=np.zeros(n, dtype=np.int32 if config.compact_state else np.int64),
+        obstacles=spawn_obstacles(config, rng),
+        rng=rng,
+        leaders=np.flatnonzero(is_leader),
+        followers=np.flatnonzero(~is_leader),
+        slot=slot,
+        group=group,
+        palette=palette,
+        config=config,
+    )
+    if config.slot_assignment == "optimal":
+        from .assignment import assign_slots
+        assign_slots(state, config)
+    return state
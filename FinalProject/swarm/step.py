@@ -0,0 +1,302 @@
+import math
+
+import numpy as np
+
+from .profiling import NULL_PROFILER
+from .spatial import build_grid
+from .state import follower_colors, leader_color, set_leaders
+
+# Rows of the pairwise distance matrix evaluated at once, bounds the
+# temporaries of the O(N^2) neighbor pass to CHUNK_SIZE * N elements
+CHUNK_SIZE = 1024
+
+
+# Unit vectors pointing from (ox, oy) to (x, y). Coincident points get (1, 0),
+# which is what cos/sin of atan2(0, 0) gave the scalar code.
+def _away(dx, dy, distance):
+    safe = np.where(distance > 0, distance, 1.0)
+    ux = np.where(distance > 0, dx / safe, 1.0)
+    uy = np.where(distance > 0, dy / safe, 0.0)
+    return ux, uy
+
+
+# Random draws for the leaders selected by the boolean mask `which`, from
+# the swarm's generator
+def _uniform(state):
+    return lambda low, high, which: state.rng.uniform(low, high, size=int(which.sum()))
+
+
+# Move the leaders. `uniform(low, high, which)` draws their random turns;
+# by default from state.rng (swarm.ensemble draws each swarm's from its own
+# generator).
+def update_leaders(state, config, uniform=None):
+    leaders = state.leaders
+    if len(leaders) == 0:
+        return
+    x, y = state.x[leaders], state.y[leaders]
+    vx, vy = state.vx[leaders], state.vy[leaders]
+    angle = state.angle[leaders]
+    margin = config.boundary_margin
+    if uniform is None:
+        uniform = _uniform(state)
+
+    if config.leader_mode == "wander":
+        # Leader periodically changes direction
+        timer = state.wander_timer[leaders] + 1
+        turn = timer > config.wander_interval
+        timer[turn] = 0
+        angle[turn] += uniform(-math.pi / 4, math.pi / 4, turn)
+        vx[turn] = config.leader_speed * np.cos(angle[turn])
+        vy[turn] = config.leader_speed * np.sin(angle[turn])
+        state.wander_timer[leaders] = timer
+
+        # Ensure leader's speed does not exceed LEADER_SPEED
+        speed = np.hypot(vx, vy)
+        scale = np.where(speed > config.leader_speed, config.leader_speed / np.where(speed > 0, speed, 1.0), 1.0)
+        vx *= scale
+        vy *= scale
+
+        # Move leader one pixel along its heading (speed is the unclamped one,
+        # as in the scalar code)
+        moving = speed > 0
+        x[moving] += vx[moving] / speed[moving]
+        y[moving] += vy[moving] / speed[moving]
+
+        # Update angle based on movement direction
+        heading = (vx != 0) | (vy != 0)
+        angle[heading] = np.arctan2(vy[heading], vx[heading])
+
+        # Bounce off boundaries
+        vx[(x <= margin) | (x >= config.width - margin)] *= -1
+        vy[(y <= margin) | (y >= config.height - margin)] *= -1
+    else:
+        # Incrementally change the leader's angle to create independent movement
+        angle += uniform(-config.turn_speed, config.turn_speed, np.ones(len(leaders), dtype=bool))
+        vx = config.leader_speed * np.cos(angle)
+        vy = config.leader_speed * np.sin(angle)
+
+        # Invert velocity on boundary collision and prevent moving out of bounds
+        hit_x = (x <= margin) | (x >= config.width - margin)
+        hit_y = (y <= margin) | (y >= config.height - margin)
+        vx[hit_x] *= -1
+        vy[hit_y] *= -1
+        x = np.where(hit_x, np.clip(x, margin, config.width - margin), x)
+        y = np.where(hit_y, np.clip(y, margin, config.height - margin), y)
+
+    state.x[leaders], state.y[leaders] = x, y
+    state.vx[leaders], state.vy[leaders] = vx, vy
+    state.angle[leaders] = angle
+    move(state, config, leaders)
+
+
+# Offset of each follower's formation slot from its leader: on the circle
+# around it, or on the slot lattice of swarm.assignment
+def formation_offsets(state, config, followers):
+    if config.slot_assignment == "optimal":
+        from .assignment import lattice_offsets
+        return lattice_offsets(config, state.slot[followers])
+    formation_angle = (2 * math.pi / config.formation_size) * state.slot[followers]
+    return config.formation_radius * np.cos(formation_angle), config.formation_radius * np.sin(formation_angle)
+
+
+# Leader index and formation point of each follower
+def formation_targets(state, config, followers):
+    leader = state.leaders[state.group[followers] % len(state.leaders)]
+    offset_x, offset_y = formation_offsets(state, config, followers)
+    return leader, state.x[leader] + offset_x, state.y[leader] + offset_y
+
+
+def seek_formation(state, config, followers):
+    leader, formation_x, formation_y = formation_targets(state, config, followers)
+    lx, ly = state.x[leader], state.y[leader]
+    x, y = state.x[followers], state.y[followers]
+    distance_to_formation = np.hypot(formation_x - x, formation_y - y)
+    distance_to_leader = np.hypot(lx - x, ly - y)
+
+    # Proportional movement towards formation, faster when far from the leader
+    desired_angle = np.arctan2(formation_y - y, formation_x - x)
+    desired_speed = np.minimum(
+        config.kp * distance_to_formation + config.leader_distance_gain * distance_to_leader,
+        config.max_boid_speed,
+    )
+
+    # Smoothly adjust angle towards desired direction
+    angle = state.angle[followers]
+    angle_diff = desired_angle - angle
+    angle_diff = np.where(angle_diff > math.pi, angle_diff - 2 * math.pi, angle_diff)
+    angle_diff = np.where(angle_diff < -math.pi, angle_diff + 2 * math.pi, angle_diff)
+    angle += np.clip(angle_diff, -config.turn_speed, config.turn_speed)
+    state.angle[followers] = angle
+
+    vx = desired_speed * np.cos(angle)
+    vy = desired_speed * np.sin(angle)
+    return vx, vy
+
+
+# Avoidance velocity of each follower. With `metrics` (a
+# swarm.metrics.FormationMetrics) the distances of the close pairs are passed
+# on to it. `grid` is a (CellGrid, gx, gy) with every boid's coordinates on
+# the grid to search instead of a grid over the screen (swarm.ensemble passes
+# one over all its swarms).
+def avoid_neighbors(state, config, followers, metrics=None, grid=None):
+    radius = config.avoid_distance if config.avoidance_mode == "separate" else config.neighbor_radius
+    fx = np.zeros(len(followers))
+    fy = np.zeros(len(followers))
+    count = np.zeros(len(followers))
+    if radius <= 0:
+        return _neighbor_force(config, fx, fy, count)
+
+    if grid is not None or config.neighbor_search == "grid":
+        # Only boids in the 3x3 cells around each follower can be close
+        if grid is None:
+            grid = build_grid(state, config, radius), state.x, state.y
+        grid, gx, gy = grid
+        row, col = grid.candidates(gx[followers], gy[followers])
+        col_is_other = col != followers[row]
+        row, col = row[col_is_other], col[col_is_other]
+        dx = state.x[followers[row]] - state.x[col]
+        dy = state.y[followers[row]] - state.y[col]
+        close = dx * dx + dy * dy < radius * radius
+        row, dx, dy = row[close], dx[close], dy[close]
+        distance = np.hypot(dx, dy)
+        accumulate_away(fx, fy, count, row, dx, dy, distance)
+        if metrics is not None:
+            metrics.observe_neighbors(len(followers), row, distance)
+        return _neighbor_force(config, fx, fy, count)
+
+    # Dense reference: every follower against every boid
+    for start in range(0, len(followers), CHUNK_SIZE):
+        rows = followers[start:start + CHUNK_SIZE]
+        dx = state.x[rows, None] - state.x[None, :]
+        dy = state.y[rows, None] - state.y[None, :]
+        close = dx * dx + dy * dy < radius * radius
+        close[np.arange(len(rows)), rows] = False  # Skip self
+
+        # Only the close pairs need a direction
+        row, col = np.nonzero(close)
+        dx, dy = dx[row, col], dy[row, col]
+        distance = np.hypot(dx, dy)
+        accumulate_away(fx, fy, count, start + row, dx, dy, distance)
+        if metrics is not None:
+            metrics.observe_neighbors(len(followers), start + row, distance)
+
+    return _neighbor_force(config, fx, fy, count)
+
+
+# Add the unit vectors (dx, dy) / |(dx, dy)| of each pair to its row's totals
+def accumulate_away(fx, fy, count, row, dx, dy, distance=None):
+    ux, uy = _away(dx, dy, np.hypot(dx, dy) if distance is None else distance)
+    fx += np.bincount(row, weights=ux, minlength=len(fx))
+    fy += np.bincount(row, weights=uy, minlength=len(fy))
+    count += np.bincount(row, minlength=len(count))
+
+
+# Turn summed unit vectors into the avoidance velocity of each avoidance mode
+def _neighbor_force(config, fx, fy, count):
+    if config.avoidance_mode == "separate":
+        return config.neighbor_avoidance_force * fx, config.neighbor_avoidance_force * fy
+
+    # Steer along the mean away direction
+    norm = np.hypot(fx, fy)
+    ux, uy = _away(fx, fy, norm)
+    gain = np.where(count > 0, config.kn * config.neighbor_avoidance_force, 0.0)
+    return gain * ux, gain * uy
+
+
+def avoid_obstacles(state, config, followers, metrics=None):
+    if metrics is None:
+        fx, fy = state.obstacles.repulsion(state.x[followers], state.y[followers], config)
+    else:
+        fx, fy, nearest = state.obstacles.repulsion(state.x[followers], state.y[followers], config, nearest=True)
+        metrics.observe_obstacles(nearest)
+    return config.obstacle_avoidance_force * fx, config.obstacle_avoidance_force * fy
+
+
+def limit_speed(vx, vy, max_speed):
+    speed = np.hypot(vx, vy)
+    scale = np.where(speed > max_speed, max_speed / np.where(speed > 0, speed, 1.0), 1.0)
+    return vx * scale, vy * scale
+
+
+def update_followers(state, config, profiler=NULL_PROFILER, metrics=None):
+    followers = state.followers
+    if len(followers) == 0:
+        return
+    if len(state.leaders) == 0:
+        with profiler.phase("move"):
+            move(state, config, followers)
+        return
+    if config.backend != "numpy" and metrics is None:
+        # Imported here so Numba is only loaded when asked for. Metrics need
+        # the pair distances of the NumPy path, so they always take it.
+        from . import kernels
+        if kernels.uses_kernel(config.backend):
+            kernels.update_followers(state, config, profiler)
+            return
+
+    with profiler.phase("formation"):
+        vx, vy = seek_formation(state, config, followers)
+    with profiler.phase("neighbors"):
+        nx, ny = avoid_neighbors(state, config, followers, metrics)
+    with profiler.phase("obstacles"):
+        ox, oy = avoid_obstacles(state, config, followers, metrics)
+    with profiler.phase("move"):
+        vx, vy = limit_speed(vx + nx + ox, vy + ny + oy, config.max_boid_speed)
+        state.vx[followers] = vx
+        state.vy[followers] = vy
+        move(state, config, followers)
+
+
+# Update position of the given boids
+def move(state, config, index):
+    x = state.x[index] + state.vx[index]
+    y = state.y[index] + state.vy[index]
+
+    # Ensure boids stay within bounds
+    if config.clamp_to_screen:
+        x = np.clip(x, config.boid_size, config.width - config.boid_size)
+        y = np.clip(y, config.boid_size, config.height - config.boid_size)
+    state.x[index], state.y[index] = x, y
+
+
+def change_leaders(state, config):
+    # Check if it's time to change the leader
+    if config.leader_change_interval <= 0:
+        return
+    state.leader_change_timer += 1
+    if state.leader_change_timer < config.leader_change_interval:
+        return
+    state.leader_change_timer = 0
+
+    # Make current leaders followers with a non-red color
+    current = state.leaders
+    state.color[current] = follower_colors(state.rng, len(current), config, state.palette)
+
+    # Randomly select new leaders from all boids
+    num_new_leaders = min(config.num_leaders, state.num_boids)
+    new_leaders = state.rng.choice(state.num_boids, size=num_new_leaders, replace=False)
+    set_leaders(state, new_leaders)
+    state.color[new_leaders] = leader_color(state.palette)
+    if config.slot_assignment == "optimal":
+        from .assignment import reassign_slots
+        reassign_slots(state, config, current)
+
+
+# Advance the whole swarm by one frame.
+#
+# Leaders move first and followers then react to the new leader position, as
+# in the per-object loop where the leader is boid 0. Unlike that loop, all
+# followers see the same snapshot of their neighbors instead of the
+# positions already updated earlier in the same frame.
+#
+# Pass a swarm.profiling.Profiler to time the update phases and a
+# swarm.metrics.FormationMetrics to record the formation quality.
+def step(state, config, profiler=NULL_PROFILER, metrics=None):
+    with profiler.phase("leaders"):
+        update_leaders(state, config)
+    update_followers(state, config, profiler, metrics)
+    with profiler.phase("leader_change"):
+        change_leaders(state, config)
+    state.frame += 1
+    if metrics is not None:
+        metrics.end_step(state, config)
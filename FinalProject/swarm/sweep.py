@@ -0,0 +1,139 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .metrics import convergence_step, count_collisions, formation_error
+from .presets import PRESETS
+from .state import spawn
+from .step import step
+
+# Bump when a change to the engine or the metrics makes cached results stale
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = ".sweep_cache"
+
+
+# Stable identity of one task: the same parameters and seed always hash to
+# the same file name
+def task_key(preset, params, seed, steps):
+    task = {"version": CACHE_VERSION, "preset": preset, "params": params, "seed": seed, "steps": steps}
+    return hashlib.sha256(json.dumps(task, sort_keys=True).encode()).hexdigest()
+
+
+# Run one headless simulation and summarize it.
+#
+# Collisions are boid pairs closer than BOID_SIZE, counted every step.
+# Convergence is the first step after which the mean formation error stays
+# within settle_fraction * FORMATION_RADIUS.
+def evaluate(preset, params, seed, steps, settle_fraction=0.1):
+    config = PRESETS[preset](**params)
+    state = spawn(config, seed)
+    errors = np.empty(steps)
+    collisions = 0
+    for i in range(steps):
+        step(state, config)
+        errors[i] = formation_error(state, config)
+        collisions += count_collisions(state, config, config.boid_size)
+
+    settled = convergence_step(errors, settle_fraction * config.formation_radius)
+    return {
+        "preset": preset,
+        "params": params,
+        "seed": seed,
+        "steps": steps,
+        "mean_formation_error": float(errors.mean()),
+        "final_formation_error": float(errors[-1]),
+        "collision_count": collisions,
+        "convergence_step": settled,
+    }
+
+
+def _cache_path(cache_dir, key):
+    return os.path.join(cache_dir, key + ".json")
+
+
+def load_cached(cache_dir, key):
+    try:
+        with open(_cache_path(cache_dir, key)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def store_cached(cache_dir, key, result):
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write then rename so an interrupted sweep never leaves a torn file
+    path = _cache_path(cache_dir, key)
+    with open(path + ".tmp", "w") as f:
+        json.dump(result, f)
+    os.replace(path + ".tmp", path)
+
+
+# Every combination of the parameter values in `grid` (name -> values)
+def expand_grid(grid):
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+# Evaluate every (parameters, seed) combination on a process pool, one task
+# per combination. Results already in cache_dir are reused; new ones are
+# stored there as soon as they finish.
+def sweep(grid, seeds, steps, preset="random_selection", workers=None, cache_dir=DEFAULT_CACHE_DIR, log=print):
+    tasks = [(params, seed) for params in expand_grid(grid) for seed in seeds]
+    results = {}
+    pending = []
+    for params, seed in tasks:
+        key = task_key(preset, params, seed, steps)
+        cached = load_cached(cache_dir, key) if cache_dir else None
+        if cached is not None:
+            results[key] = cached
+        else:
+            pending.append((key, params, seed))
+
+    if log:
+        log(f"{len(tasks)} tasks, {len(tasks) - len(pending)} cached, {len(pending)} to run")
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(evaluate, preset, params, seed, steps): key for key, params, seed in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                key = futures[future]
+                results[key] = future.result()
+                if cache_dir:
+                    store_cached(cache_dir, key, results[key])
+                if log:
+                    log(f"[{done}/{len(pending)}] {results[key]['params']} seed={results[key]['seed']}")
+
+    return [results[task_key(preset, params, seed, steps)] for params, seed in tasks]
+
+
+# "KP=0.005,0.01" -> ("kp", [0.005, 0.01])
+def parse_param(text):
+    name, values = text.split("=", 1)
+    return name.strip().lower(), [json.loads(value) for value in values.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep swarm parameters over a process pool")
+    parser.add_argument("--preset", default="random_selection", choices=list(PRESETS))
+    parser.add_argument("--param", action="append", default=[], type=parse_param,
+                        help="NAME=v1,v2,... for any SwarmConfig field, e.g. KP=0.005,0.01")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0])
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--output", default="sweep.json")
+    args = parser.parse_args()
+
+    results = sweep(dict(args.param), args.seeds, args.steps, args.preset, args.workers, args.cache_dir)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import scipy.sparse as sp
+
+
+# Robot and leader paths, one row per recorded step
+@dataclass
+class UnicycleTrajectory:
+    t: np.ndarray  # (T,)
+    x: np.ndarray  # (T, N)
+    y: np.ndarray
+    theta: np.ndarray
+    leader_x: np.ndarray  # (T,)
+    leader_y: np.ndarray
+
+
+# Leader moving on a circle, the reference of Test/Question4
+def circle_leader(radius=3.0, frequency=0.5):
+    def leader(t):
+        return radius * np.cos(2 * np.pi * frequency * t), radius * np.sin(2 * np.pi * frequency * t)
+    return leader
+
+
+# Simulate N unicycle robots following a leader in formation with the
+# look-ahead consensus law of Test/Question4:
+#
+#     V_i = sum_j A[i, j] (z_j - z_i) + C[i] (leader - z_i)
+#
+# All robots are updated together each step. `adjacency` is an (N, N) array
+# or SciPy sparse matrix (use sparse for large teams), `leader_gain` the
+# vector C (or a scalar) and `leader` a function of time returning the
+# leader's (x, y). Every `record_every` steps the state is written to
+# preallocated arrays; the initial state is always the first row.
+def simulate(x0, y0, theta0, adjacency, leader_gain=1.0, steps=1000, dt=0.01, d=1.0, leader=None,
+             record_every=1):
+    if leader is None:
+        leader = circle_leader()
+    x = np.array(x0, dtype=np.float64)
+    y = np.array(y0, dtype=np.float64)
+    theta = np.array(theta0, dtype=np.float64)
+    n = len(x)
+    gain = np.broadcast_to(np.asarray(leader_gain, dtype=np.float64), (n,))
+    a = sp.csr_matrix(adjacency) if sp.issparse(adjacency) else np.asarray(adjacency, dtype=np.float64)
+    degree = np.asarray(a.sum(axis=1)).ravel()
+
+    rows = steps // record_every + 1
+    trajectory = UnicycleTrajectory(
+        t=np.empty(rows),
+        x=np.empty((rows, n)),
+        y=np.empty((rows, n)),
+        theta=np.empty((rows, n)),
+        leader_x=np.empty(rows),
+        leader_y=np.empty(rows),
+    )
+
+    def record(row, t):
+        trajectory.t[row] = t
+        trajectory.x[row] = x
+        trajectory.y[row] = y
+        trajectory.theta[row] = theta
+        trajectory.leader_x[row], trajectory.leader_y[row] = leader(t)
+
+    record(0, 0.0)
+    for k in range(steps):
+        t = k * dt
+        lx, ly = leader(t)
+        c, s = np.cos(theta), np.sin(theta)
+        z1 = x + d * c
+        z2 = y + d * s
+
+        # Sum of A[i, j] (z_j - z_i) is (A z)_i - degree_i z_i
+        v1 = a @ z1 - degree * z1 + gain * (lx - z1)
+        v2 = a @ z2 - degree * z2 + gain * (ly - z2)
+
+        # z' = [[cos, -d sin], [sin, d cos]] @ (v, omega); the matrix has
+        # determinant d, so its inverse is written out rather than calling
+        # np.linalg.inv for every robot
+        v = c * v1 + s * v2
+        omega = (c * v2 - s * v1) / d
+
+        x += dt * v * c
+        y += dt * v * s
+        theta += dt * omega
+        if (k + 1) % record_every == 0:
+            record((k + 1) // record_every, (k + 1) * dt)
+    return trajectory
+
+
+# Sparse adjacency of a ring where every robot listens to its `neighbors`
+# nearest robots on each side
+def ring_adjacency(n, neighbors=1):
+    i = np.arange(n)
+    offsets = [o for o in range(-neighbors, neighbors + 1) if o % n]
+    rows = np.tile(i, len(offsets))
+    cols = np.concatenate([(i + o) % n for o in offsets]) if offsets else rows
+    a = sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n))
+    a.data[:] = 1.0
+    return a
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a large team of unicycle robots following a leader")
+    parser.add_argument("--robots", type=int, default=10000)
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--dt", type=float, default=0.01)
+    parser.add_argument("--record-every", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    n = args.robots
+    start = time.perf_counter()
+    trajectory = simulate(rng.uniform(-5, 5, n), rng.uniform(-5, 5, n), rng.uniform(-np.pi, np.pi, n),
+                          ring_adjacency(n), steps=args.steps, dt=args.dt, record_every=args.record_every)
+    elapsed = time.perf_counter() - start
+    gap = np.hypot(trajectory.x[-1] - trajectory.leader_x[-1], trajectory.y[-1] - trajectory.leader_y[-1])
+    print(f"{n} robots, {args.steps} steps in {elapsed:.2f} s ({elapsed / args.steps * 1000:.2f} ms/step); "
+          f"final distance to the leader {gap.min():.3f}..{gap.max():.3f}")
+
+
+if __name__ == "__main__":
+    main()